@@ -1,11 +1,15 @@
 from fastapi import APIRouter, Depends, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.services.mock_service import MockServiceService
-from app.services.mock_processor import MockProcessor
+from app.services.mock_processor import MockProcessor, StreamedBody, binary_body_placeholder
 from app.services.file_logger import file_logger
 from app.api.websocket import notify_new_log
-from app.models.mock_service import ResponseStrategy
+from app.models.mock_service import ResponseStrategy, LogLevel
+from typing import Dict, Any
+import asyncio
+import os
 import time
 import logging
 
@@ -14,6 +18,113 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 mock_processor = MockProcessor()
 
+# Максимальный размер тел запроса и ответа, сохраняемых в лог
+LOG_BODY_LIMIT = int(os.getenv("LOG_BODY_MAX", str(8 * 1024)))
+# Максимальный размер тела mock запроса (больше - ответ 413)
+REQUEST_BODY_LIMIT = int(os.getenv("REQUEST_BODY_MAX", str(50 * 1024 * 1024)))
+
+
+def _truncate(value, limit: int = LOG_BODY_LIMIT):
+    """Обрезать строку или байты для лога"""
+    if isinstance(value, (str, bytes)) and len(value) > limit:
+        return value[:limit] + ('…' if isinstance(value, str) else b'...')
+    return value
+
+def _logged_response_body(response_body):
+    """Тело ответа для лога: потоковые и бинарные ответы заменяются описанием"""
+    if isinstance(response_body, StreamedBody):
+        return str(response_body)
+    if isinstance(response_body, bytes):
+        return binary_body_placeholder(len(response_body))
+    return _truncate(response_body)
+
+# Очередь записей лога: запись на диск и уведомления идут вне обработки запроса
+LOG_QUEUE_SIZE = 10_000
+LOG_WRITE_BATCH = 500
+log_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+dropped_logs = 0
+
+# Заголовки, которые нужны для сопоставления SOAP сервисов
+SOAP_MATCH_HEADERS = ('soapaction', 'content-type')
+
+
+def _pick_headers(request: Request, keys=SOAP_MATCH_HEADERS) -> Dict[str, str]:
+    """Выбрать из запроса только нужные заголовки без копирования всех"""
+    picked = {}
+    for key in keys:
+        value = request.headers.get(key)
+        if value is not None:
+            picked[key] = value
+    return picked
+
+
+async def read_body(request: Request) -> bytes:
+    """
+    Чтение тела запроса с ограничением размера (REQUEST_BODY_MAX)
+    
+    Тело с Content-Length больше лимита отклоняется до чтения; без
+    Content-Length (chunked) тело читается потоком, пока не превысит лимит.
+    """
+    content_length = request.headers.get('content-length')
+    if content_length is not None:
+        try:
+            size = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный заголовок Content-Length")
+        if size > REQUEST_BODY_LIMIT:
+            raise HTTPException(status_code=413, detail=f"Тело запроса больше {REQUEST_BODY_LIMIT} байт")
+        # request.body() кэширует тело - повторные вызовы не читают поток
+        return await request.body()
+    
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > REQUEST_BODY_LIMIT:
+            raise HTTPException(status_code=413, detail=f"Тело запроса больше {REQUEST_BODY_LIMIT} байт")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def enqueue_log(**record):
+    """Поставить запись лога в очередь (при переполнении запись отбрасывается)"""
+    global dropped_logs
+    try:
+        log_queue.put_nowait(record)
+    except asyncio.QueueFull:
+        dropped_logs += 1
+        if dropped_logs == 1 or dropped_logs % 1000 == 0:
+            logger.warning(f"Очередь логов переполнена, отброшено записей: {dropped_logs}")
+
+
+async def _write_log_batch(batch):
+    """Записать пачку логов в файл и уведомить WebSocket клиентов"""
+    try:
+        log_entries = file_logger.log_requests(batch)
+    except Exception as e:
+        logger.error(f"Ошибка записи логов запросов: {e}")
+        return
+    for log_entry in log_entries:
+        await notify_new_log(log_entry)
+
+
+async def log_writer_loop():
+    """Фоновая задача: забирает логи из очереди и пишет их пачками"""
+    while True:
+        batch = [await log_queue.get()]
+        while len(batch) < LOG_WRITE_BATCH and not log_queue.empty():
+            batch.append(log_queue.get_nowait())
+        await _write_log_batch(batch)
+
+
+async def flush_log_queue():
+    """Дописать оставшиеся в очереди логи (при завершении работы)"""
+    batch = []
+    while not log_queue.empty():
+        batch.append(log_queue.get_nowait())
+    if batch:
+        await _write_log_batch(batch)
+
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS"])
 async def handle_mock_request(
@@ -22,84 +133,121 @@ async def handle_mock_request(
     db: AsyncSession = Depends(get_db)
 ):
     """Обработчик всех mock запросов"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Добавляем слеш в начало пути если его нет
     if not path.startswith('/'):
         path = f'/{path}'
     
     # Читаем тело запроса один раз для использования в логах и обработке
-    body_bytes = await request.body()
-    body_str = body_bytes.decode('utf-8', errors='ignore') if body_bytes else ''
+    body_bytes = await read_body(request)
+    # Строковое представление тела декодируем только если оно понадобится стратегии
+    body_str = None
+    
+    def _body_str() -> str:
+        nonlocal body_str
+        if body_str is None:
+            body_str = body_bytes.decode('utf-8', errors='ignore') if body_bytes else ''
+        return body_str
+    
+    def _request_log_fields() -> Dict[str, Any]:
+        """Данные запроса для полного лога (собираются только если лог пишется)"""
+        # Для логов достаточно ограниченного префикса тела
+        log_body = body_bytes[:LOG_BODY_LIMIT].decode('utf-8', errors='replace') if body_bytes else ''
+        if len(body_bytes) > LOG_BODY_LIMIT:
+            log_body += '…'
+        return dict(
+            path=path,
+            method=request.method,
+            headers=dict(request.headers),
+            query_params=dict(request.query_params),
+            body=log_body,
+            body_len=len(body_bytes)
+        )
     
     service = MockServiceService(db)
     
     try:
         # Ищем подходящий mock сервис и извлекаем path параметры
         # Передаем тело запроса и заголовки для SOAP сервисов
-        headers_dict = dict(request.headers)
-        mock_service, path_params = await service.find_mock_service_by_path_and_method(path, request.method, body_str, headers_dict)
+        mock_service, path_params = await service.find_mock_service_by_path_and_method(
+            path, request.method, body_bytes, _pick_headers(request)
+        )
         
         if not mock_service:
             # Логируем неопознанный запрос в файл
-            processing_time = time.time() - start_time
-            log_entry = file_logger.log_request(
+            processing_time = time.perf_counter() - start_time
+            enqueue_log(
                 mock_service_id=None,
                 mock_service_name=None,
-                path=path,
-                method=request.method,
-                headers=dict(request.headers),
-                query_params=dict(request.query_params),
-                body=body_str,
+                **_request_log_fields(),
                 response_status=404,
                 response_body="Mock сервис не найден",
                 response_headers={},
                 processing_time=processing_time
             )
             
-            # Уведомляем WebSocket клиентов
-            await notify_new_log(log_entry)
-            
             raise HTTPException(status_code=404, detail="Mock сервис не найден")
         
         # Обрабатываем запрос согласно настройкам mock сервиса
-        # Для proxy передаем сырые байты, для других стратегий - строку
+        # Для proxy передаем сырые байты, для conditional - строку
         if mock_service.strategy == ResponseStrategy.PROXY:
             status_code, response_body, response_headers, proxy_info = await mock_processor.process_request(
                 mock_service, request, body_bytes, path_params
             )
         elif mock_service.strategy == ResponseStrategy.CONDITIONAL:
             status_code, response_body, response_headers, proxy_info = await mock_processor.process_request(
-                mock_service, request, body_str, path_params, body_bytes
+                mock_service, request, _body_str(), path_params, body_bytes
             )
         else:
+            # Статической стратегии тело запроса не нужно
             status_code, response_body, response_headers, proxy_info = await mock_processor.process_request(
-                mock_service, request, body_str, path_params
+                mock_service, request, None, path_params
             )
         
-        # Логируем запрос в файл
-        processing_time = time.time() - start_time
-        log_entry = file_logger.log_request(
-            mock_service_id=mock_service.id,
-            mock_service_name=mock_service.name,
-            path=path,
-            method=request.method,
-            headers=dict(request.headers),
-            query_params=dict(request.query_params),
-            body=body_str,
-            response_status=status_code,
-            response_body=response_body,
-            response_headers=response_headers,
-            processing_time=processing_time,
-            proxy_info=proxy_info
-        )
-        
-        # Уведомляем WebSocket клиентов
-        await notify_new_log(log_entry)
+        # Логируем запрос в файл согласно уровню логирования сервиса
+        log_level = mock_service.log_level
+        if log_level == LogLevel.SUMMARY:
+            enqueue_log(
+                mock_service_id=mock_service.id,
+                mock_service_name=mock_service.name,
+                path=path,
+                method=request.method,
+                headers={},
+                query_params={},
+                body='',
+                body_len=len(body_bytes),
+                response_status=status_code,
+                response_body='',
+                response_headers={},
+                processing_time=time.perf_counter() - start_time
+            )
+        elif log_level != LogLevel.NONE:
+            # Тело ответа прокси тоже обрезаем
+            if proxy_info and proxy_info.get("proxy_response_body"):
+                proxy_info["proxy_response_body"] = _truncate(proxy_info["proxy_response_body"])
+            processing_time = time.perf_counter() - start_time
+            enqueue_log(
+                mock_service_id=mock_service.id,
+                mock_service_name=mock_service.name,
+                **_request_log_fields(),
+                response_status=status_code,
+                response_body=_logged_response_body(response_body),
+                response_headers=response_headers,
+                processing_time=processing_time,
+                proxy_info=proxy_info
+            )
         
         # Возвращаем ответ
         # Для proxy не устанавливаем media_type, чтобы не перезаписывать content-type
-        if mock_service.strategy == ResponseStrategy.PROXY:
+        if isinstance(response_body, StreamedBody):
+            # Большой ответ прокси передаем по мере получения от целевого сервиса
+            return StreamingResponse(
+                response_body,
+                status_code=status_code,
+                headers=response_headers
+            )
+        elif mock_service.strategy == ResponseStrategy.PROXY:
             return Response(
                 content=response_body,
                 status_code=status_code,
@@ -118,24 +266,18 @@ async def handle_mock_request(
         raise
     except Exception as e:
         logger.error(f"Ошибка при обработке mock запроса: {e}")
+        error_message = f"Ошибка сервера: {e}"
         
         # Логируем ошибку в файл
-        processing_time = time.time() - start_time
-        log_entry = file_logger.log_request(
+        processing_time = time.perf_counter() - start_time
+        enqueue_log(
             mock_service_id=None,
             mock_service_name=None,
-            path=path,
-            method=request.method,
-            headers=dict(request.headers),
-            query_params=dict(request.query_params),
-            body=body_str,
+            **_request_log_fields(),
             response_status=500,
-            response_body=f"Ошибка сервера: {str(e)}",
+            response_body=error_message,
             response_headers={},
             processing_time=processing_time
         )
         
-        # Уведомляем WebSocket клиентов
-        await notify_new_log(log_entry)
-        
-        raise HTTPException(status_code=500, detail=f"Ошибка сервера: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=error_message) 
\ No newline at end of file
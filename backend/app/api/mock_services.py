@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
@@ -7,13 +7,66 @@ from app.services.file_logger import file_logger, RequestLogEntry
 from app.schemas.mock_service import (
     MockServiceCreate, MockServiceUpdate, MockServiceResponse
 )
+import asyncio
 import os
 import shutil
 import glob
 import time
+from fnmatch import fnmatch
 
 router = APIRouter(prefix="/api/mock-services", tags=["Mock Services"])
 
+# Кэш размеров директорий для /system/disk-usage: {ключ: (время расчета, размер)}
+DISK_USAGE_CACHE_TTL = 10
+_size_cache = {}
+
+
+def _cached_size(key: str, compute) -> int:
+    """Вернуть размер из кэша или пересчитать, если запись старше TTL"""
+    now = time.monotonic()
+    cached = _size_cache.get(key)
+    if cached and now - cached[0] < DISK_USAGE_CACHE_TTL:
+        return cached[1]
+    size = compute()
+    _size_cache[key] = (now, size)
+    return size
+
+
+def get_directory_size(path: str) -> int:
+    """Получить размер директории в байтах (рекурсивный обход через os.scandir)"""
+    total = 0
+    try:
+        entries = os.scandir(path)
+    except OSError:
+        return 0
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    total += get_directory_size(entry.path)
+                elif entry.is_file():
+                    total += entry.stat().st_size
+            except OSError:
+                # Файл мог быть удален (например, при ротации) во время обхода
+                continue
+    return total
+
+
+def get_docker_logs_size() -> int:
+    """Примерный размер Docker логов контейнеров сервиса"""
+    total = 0
+    docker_log_paths = [
+        "/var/lib/docker/containers/*/mock-service-backend*-json.log*",
+        "/var/lib/docker/containers/*/mock-service-frontend*-json.log*"
+    ]
+    for pattern in docker_log_paths:
+        for log_file in glob.glob(pattern):
+            try:
+                total += os.path.getsize(log_file)
+            except OSError:
+                continue
+    return total
+
 
 @router.post("/", response_model=MockServiceResponse)
 async def create_mock_service(
@@ -88,6 +141,13 @@ async def delete_mock_service(
     return {"message": "Mock сервис успешно удален"}
 
 
+def logs_response(logs: List[RequestLogEntry]) -> Response:
+    """JSON ответ со списком логов"""
+    # Записи из памяти уже закодированы при записи в файл - склеиваем готовые байты
+    content = b"[" + b",".join(log.json_bytes for log in logs) + b"]"
+    return Response(content=content, media_type="application/json")
+
+
 @router.get("/{service_id}/logs", response_model=List[dict])
 async def get_service_logs(
     service_id: int,
@@ -96,18 +156,18 @@ async def get_service_logs(
     db: AsyncSession = Depends(get_db)
 ):
     """Получить логи запросов для конкретного mock сервиса"""
-    service = MockServiceService(db)
-
-    # Проверяем, существует ли сервис
-    mock_service = await service.get_mock_service(service_id)
-    if not mock_service:
-        raise HTTPException(status_code=404, detail="Mock сервис не найден")
-
     # Получаем логи из файлов
     logs = file_logger.get_logs(service_id=service_id, skip=skip, limit=limit)
 
-    # Конвертируем в словари для совместимости с frontend
-    return [log.to_dict() for log in logs]
+    # Существование сервиса проверяем только при пустом ответе (при любом skip):
+    # при непустом ответе сервис заведомо существовал, и лишний запрос к БД не нужен
+    if not logs:
+        mock_service = await MockServiceService(db).get_mock_service(service_id)
+        if not mock_service:
+            raise HTTPException(status_code=404, detail="Mock сервис не найден")
+
+    # Сериализуем сразу в JSON, минуя jsonable_encoder и валидацию response_model
+    return logs_response(logs)
 
 
 @router.delete("/{service_id}/logs")
@@ -123,31 +183,8 @@ async def clear_service_logs(
     if not mock_service:
         raise HTTPException(status_code=404, detail="Mock сервис не найден")
 
-    # Получаем все логи
-    all_logs = file_logger.get_logs(skip=0, limit=1000000)
-
-    # Фильтруем логи, оставляя только те, которые не относятся к этому сервису
-    remaining_logs = [log for log in all_logs if log.mock_service_id != service_id]
-
-    # Подсчитываем количество удаленных записей
-    deleted_count = len(all_logs) - len(remaining_logs)
-
-    # Перезаписываем основной файл логов
-    logs_dir = os.getenv("LOG_DIR", "logs")
-    main_log_file = os.path.join(logs_dir, "requests.log")
-
-    # Очищаем основной файл и записываем оставшиеся логи
     try:
-        import json
-        with open(main_log_file, 'w', encoding='utf-8') as f:
-            for log in remaining_logs:
-                f.write(json.dumps(log.to_dict(), ensure_ascii=False) + '\n')
-
-        # Удаляем архивные файлы (они больше не актуальны после очистки)
-        for i in range(1, int(os.getenv("LOG_BACKUP_COUNT", "10")) + 1):
-            archive_file = f"{main_log_file}.{i}"
-            if os.path.exists(archive_file):
-                os.remove(archive_file)
+        deleted_count = file_logger.clear_service_logs(service_id)
 
         return {
             "message": f"Логи для mock сервиса успешно очищены",
@@ -167,8 +204,8 @@ async def get_all_logs(
     # Получаем логи из файлов
     logs = file_logger.get_logs(skip=skip, limit=limit)
     
-    # Конвертируем в словари для совместимости с frontend
-    return [log.to_dict() for log in logs]
+    # Сериализуем сразу в JSON, минуя jsonable_encoder и валидацию response_model
+    return logs_response(logs)
 
 
 @router.get("/logs/files/info")
@@ -180,37 +217,30 @@ async def get_log_files_info():
     }
 
 
+def format_bytes(bytes_value):
+    """Форматирование байтов в читаемый вид"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes_value < 1024.0:
+            return f"{bytes_value:.1f} {unit}"
+        bytes_value /= 1024.0
+    return f"{bytes_value:.1f} TB"
+
+
 @router.get("/system/disk-usage")
 async def get_disk_usage():
     """Получить информацию об использовании дискового пространства"""
-    
-    def get_directory_size(path):
-        """Получить размер директории в байтах"""
-        if not os.path.exists(path):
-            return 0
-        total = 0
-        for dirpath, dirnames, filenames in os.walk(path):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                if os.path.exists(filepath):
-                    total += os.path.getsize(filepath)
-        return total
-    
-    def format_bytes(bytes_value):
-        """Форматирование байтов в читаемый вид"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes_value < 1024.0:
-                return f"{bytes_value:.1f} {unit}"
-            bytes_value /= 1024.0
-        return f"{bytes_value:.1f} TB"
-    
+    # Обход файловой системы выполняем вне event loop
+    return await asyncio.to_thread(_compute_disk_usage)
+
+
+def _compute_disk_usage():
     # Получаем информацию о свободном месте
     logs_dir = os.getenv("LOG_DIR", "logs")
     data_dir = "data"
     
     # Размер директорий
-    logs_size = get_directory_size(logs_dir)
-    data_size = get_directory_size(data_dir)
+    logs_size = _cached_size(f"dir:{logs_dir}", lambda: get_directory_size(logs_dir))
+    data_size = _cached_size(f"dir:{data_dir}", lambda: get_directory_size(data_dir))
     
     # Свободное место на диске
     try:
@@ -222,19 +252,10 @@ async def get_disk_usage():
         free_space = total_space = used_space = 0
     
     # Docker логи (примерная оценка)
-    docker_logs_estimate = 0
     try:
-        # Пытаемся найти Docker логи контейнеров
-        docker_log_paths = [
-            "/var/lib/docker/containers/*/mock-service-backend*-json.log*",
-            "/var/lib/docker/containers/*/mock-service-frontend*-json.log*"
-        ]
-        for pattern in docker_log_paths:
-            for log_file in glob.glob(pattern):
-                if os.path.exists(log_file):
-                    docker_logs_estimate += os.path.getsize(log_file)
+        docker_logs_estimate = _cached_size("docker_logs", get_docker_logs_size)
     except:
-        pass
+        docker_logs_estimate = 0
     
     return {
         "disk_usage": {
@@ -269,7 +290,11 @@ async def get_disk_usage():
 @router.post("/logs/cleanup")
 async def cleanup_old_logs():
     """Принудительная очистка старых логов"""
-    
+    # Удаление файлов выполняем вне event loop
+    return await asyncio.to_thread(_cleanup_old_logs)
+
+
+def _cleanup_old_logs():
     logs_dir = os.getenv("LOG_DIR", "logs")
     if not os.path.exists(logs_dir):
         return {"message": "Директория логов не найдена", "cleaned_files": 0}
@@ -280,15 +305,18 @@ async def cleanup_old_logs():
     # Очищаем логи старше 30 дней
     cutoff_time = time.time() - (30 * 24 * 60 * 60)  # 30 дней
     
-    for log_file in glob.glob(os.path.join(logs_dir, "*.log.*")):
-        try:
-            if os.path.getmtime(log_file) < cutoff_time:
-                size = os.path.getsize(log_file)
-                os.remove(log_file)
-                cleaned_files += 1
-                cleaned_size += size
-        except OSError:
-            continue
+    with os.scandir(logs_dir) as entries:
+        for entry in entries:
+            if not fnmatch(entry.name, "*.log.*"):
+                continue
+            try:
+                stat = entry.stat()
+                if stat.st_mtime < cutoff_time:
+                    os.unlink(entry.path)
+                    cleaned_files += 1
+                    cleaned_size += stat.st_size
+            except OSError:
+                continue
     
     return {
         "message": f"Очищено {cleaned_files} старых файлов логов",
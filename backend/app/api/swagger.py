@@ -2,10 +2,17 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
-from ..services.swagger_service import SwaggerService, SwaggerImportResult
+from ..services.swagger_service import (
+    SwaggerService, SwaggerImportResult,
+    parse_swagger_content_task, generate_mock_services_task
+)
 from ..services.mock_service import MockServiceService
 from ..schemas.mock_service import MockServiceCreate, MockServiceResponse
 from ..schemas.swagger import SwaggerContentRequest, SwaggerImportRequest
@@ -14,6 +21,67 @@ router = APIRouter(prefix="/api/swagger", tags=["swagger"])
 
 swagger_service = SwaggerService()
 
+# Спецификации больше этого размера (символы) парсятся в пуле процессов
+SWAGGER_POOL_THRESHOLD = 256 * 1024
+# Начиная с этого числа эндпоинтов генерация mock сервисов идет в пуле процессов
+SWAGGER_POOL_MIN_ENDPOINTS = 50
+# Число рабочих процессов: импорт Swagger - редкая операция, и пул не должен
+# отнимать все ядра у основного процесса приложения
+SWAGGER_POOL_WORKERS = int(os.getenv("SWAGGER_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_swagger_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_swagger_pool() -> ProcessPoolExecutor:
+    """Пул процессов создается при первом большом импорте"""
+    global _swagger_pool
+    if _swagger_pool is None:
+        # spawn: не форкаем процесс с запущенным event loop и потоками
+        _swagger_pool = ProcessPoolExecutor(
+            max_workers=SWAGGER_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _swagger_pool
+
+
+def shutdown_swagger_pool():
+    """Остановить пул процессов (при завершении приложения)"""
+    global _swagger_pool
+    if _swagger_pool is not None:
+        _swagger_pool.shutdown(cancel_futures=True)
+        _swagger_pool = None
+
+
+async def _run_in_pool(func, *args):
+    """
+    Выполнить задачу в пуле процессов
+    
+    Сломанный пул (упал рабочий процесс) больше не принимает задачи, поэтому
+    он останавливается, и следующий вызов создаст новый.
+    """
+    pool = _get_swagger_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    except BrokenProcessPool as e:
+        # Пул мог быть уже пересоздан параллельным запросом - его не трогаем
+        if _swagger_pool is pool:
+            shutdown_swagger_pool()
+        raise RuntimeError(f"Рабочий процесс обработки Swagger завершился с ошибкой: {e}") from e
+
+
+async def _parse_content(content: str, content_type: str) -> SwaggerImportResult:
+    """Парсинг Swagger без блокировки event loop для больших спецификаций"""
+    if len(content) < SWAGGER_POOL_THRESHOLD:
+        return swagger_service.parse_swagger_content(content, content_type)
+    return await _run_in_pool(parse_swagger_content_task, content, content_type)
+
+
+async def _generate_mock_services(swagger_result: SwaggerImportResult, base_path: str) -> List[MockServiceCreate]:
+    """Генерация mock сервисов, для больших спецификаций - в пуле процессов"""
+    if len(swagger_result.endpoints) < SWAGGER_POOL_MIN_ENDPOINTS:
+        return swagger_service.generate_mock_services(swagger_result, base_path)
+    return await _run_in_pool(generate_mock_services_task, swagger_result, base_path)
+
 @router.post("/parse", response_model=SwaggerImportResult)
 async def parse_swagger_file(
     file: UploadFile = File(...),
@@ -33,7 +101,7 @@ async def parse_swagger_file(
                 content_type = 'json'
         
         # Парсим файл
-        result = swagger_service.parse_swagger_content(content_str, content_type)
+        result = await _parse_content(content_str, content_type)
         
         return result
         
@@ -52,7 +120,7 @@ async def parse_swagger_file(
 async def parse_swagger_content(request: SwaggerContentRequest):
     """Парсит Swagger/OpenAPI контент из строки"""
     try:
-        result = swagger_service.parse_swagger_content(request.content, request.content_type)
+        result = await _parse_content(request.content, request.content_type)
         return result
     except Exception as e:
         raise HTTPException(
@@ -80,7 +148,7 @@ async def import_swagger_as_mocks(
                 content_type = 'json'
         
         # Парсим Swagger
-        swagger_result = swagger_service.parse_swagger_content(content_str, content_type)
+        swagger_result = await _parse_content(content_str, content_type)
         
         if swagger_result.errors:
             raise HTTPException(
@@ -92,22 +160,11 @@ async def import_swagger_as_mocks(
             )
         
         # Генерируем mock сервисы
-        mock_services_data = swagger_service.generate_mock_services(swagger_result, base_path)
+        mock_services_data = await _generate_mock_services(swagger_result, base_path)
         
         # Сохраняем в базу данных
         mock_service_service = MockServiceService(db)
-        created_services = []
-        
-        for mock_data in mock_services_data:
-            try:
-                created_service = await mock_service_service.create_mock_service(mock_data)
-                created_services.append(created_service)
-            except Exception as e:
-                # Если сервис уже существует или другая ошибка, пропускаем
-                print(f"Ошибка создания сервиса {mock_data.name}: {str(e)}")
-                continue
-        
-        return created_services
+        return await mock_service_service.bulk_create_mock_services(mock_services_data)
         
     except UnicodeDecodeError:
         raise HTTPException(
@@ -130,7 +187,7 @@ async def import_swagger_content_as_mocks(
     """Импортирует Swagger контент и создает mock сервисы"""
     try:
         # Парсим Swagger
-        swagger_result = swagger_service.parse_swagger_content(request.content, request.content_type)
+        swagger_result = await _parse_content(request.content, request.content_type)
         
         if swagger_result.errors:
             raise HTTPException(
@@ -142,22 +199,11 @@ async def import_swagger_content_as_mocks(
             )
         
         # Генерируем mock сервисы
-        mock_services_data = swagger_service.generate_mock_services(swagger_result, request.base_path)
+        mock_services_data = await _generate_mock_services(swagger_result, request.base_path)
         
         # Сохраняем в базу данных
         mock_service_service = MockServiceService(db)
-        created_services = []
-        
-        for mock_data in mock_services_data:
-            try:
-                created_service = await mock_service_service.create_mock_service(mock_data)
-                created_services.append(created_service)
-            except Exception as e:
-                # Если сервис уже существует или другая ошибка, пропускаем
-                print(f"Ошибка создания сервиса {mock_data.name}: {str(e)}")
-                continue
-        
-        return created_services
+        return await mock_service_service.bulk_create_mock_services(mock_services_data)
         
     except HTTPException:
         raise
@@ -186,7 +232,7 @@ async def preview_swagger_import(
                 content_type = 'json'
         
         # Парсим Swagger
-        swagger_result = swagger_service.parse_swagger_content(content_str, content_type)
+        swagger_result = await _parse_content(content_str, content_type)
         
         if swagger_result.errors:
             raise HTTPException(
@@ -198,7 +244,7 @@ async def preview_swagger_import(
             )
         
         # Генерируем mock сервисы без сохранения
-        mock_services_data = swagger_service.generate_mock_services(swagger_result, base_path)
+        mock_services_data = await _generate_mock_services(swagger_result, base_path)
         
         return mock_services_data
         
@@ -220,7 +266,7 @@ async def preview_swagger_content_import(request: SwaggerImportRequest):
     """Предварительный просмотр mock сервисов из Swagger контента"""
     try:
         # Парсим Swagger
-        swagger_result = swagger_service.parse_swagger_content(request.content, request.content_type)
+        swagger_result = await _parse_content(request.content, request.content_type)
         
         if swagger_result.errors:
             raise HTTPException(
@@ -232,7 +278,7 @@ async def preview_swagger_content_import(request: SwaggerImportRequest):
             )
         
         # Генерируем mock сервисы без сохранения
-        mock_services_data = swagger_service.generate_mock_services(swagger_result, request.base_path)
+        mock_services_data = await _generate_mock_services(swagger_result, request.base_path)
         
         return mock_services_data
         
@@ -1,90 +1,194 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from fastapi import APIRouter, WebSocket, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.services.mock_service import MockServiceService
 from app.services.file_logger import RequestLogEntry
-import json
+import orjson
 import asyncio
+import os
 import logging
-from typing import List, Dict, Any
-from datetime import datetime
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Set, Optional
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Хранилище активных WebSocket соединений
+@dataclass(slots=True, eq=False)
+class Connection:
+    """Активное WebSocket соединение с буфером неотправленных логов"""
+    websocket: WebSocket
+    service_id: Optional[int] = None
+    # Ограниченный буфер: при переполнении вытесняются самые старые логи
+    pending: Deque[bytes] = field(default_factory=lambda: deque(maxlen=ConnectionManager.MAX_BUFFERED))
+    # Время последнего лога в буфере (уже закодированная JSON строка)
+    pending_timestamp: bytes = b'null'
+    # Число логов, вытесненных из буфера с последней отправки
+    dropped: int = 0
+    # Будит задачу отправки: появился первый лог или набралась полная пачка
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+    flusher_task: Optional[asyncio.Task] = None
+
+
 class ConnectionManager:
+    # Интервал отправки накопленных логов (секунды)
+    FLUSH_INTERVAL = 0.05
+    # Размер пачки логов: полная пачка отправляется, не дожидаясь таймера.
+    # Ограничивает размер одного сообщения: в логе два тела
+    # (запрос и ответ) до LOG_BODY_MAX (8 КБ по умолчанию), так что сообщение из
+    # 140 логов не превышает ~2 МБ даже при тысячах запросов в секунду
+    MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "140"))
+    # Сколько логов держится в буфере клиента, который не успевает их читать
+    MAX_BUFFERED = int(os.getenv("WS_MAX_BUFFERED", "5000"))
+    # Время ожидания отправки сообщения, после которого клиент отключается (секунды)
+    SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.service_connections: Dict[int, List[WebSocket]] = {}
+        self.active_connections: Dict[WebSocket, Connection] = {}
+        # Подписчики на все логи и на логи конкретного сервиса
+        self.all_connections: Set[Connection] = set()
+        self.service_connections: Dict[int, Set[Connection]] = {}
 
     async def connect(self, websocket: WebSocket, service_id: int = None):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = Connection(websocket, service_id)
+        self.active_connections[websocket] = connection
         
-        if service_id:
-            if service_id not in self.service_connections:
-                self.service_connections[service_id] = []
-            self.service_connections[service_id].append(websocket)
+        if service_id is None:
+            self.all_connections.add(connection)
+        else:
+            self.service_connections.setdefault(service_id, set()).add(connection)
+
+        connection.flusher_task = asyncio.create_task(self._flusher(connection))
 
     def disconnect(self, websocket: WebSocket, service_id: int = None):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        connection = self.active_connections.pop(websocket, None)
+        if connection is None:
+            return
+
+        if connection.flusher_task:
+            connection.flusher_task.cancel()
         
-        if service_id and service_id in self.service_connections:
-            if websocket in self.service_connections[service_id]:
-                self.service_connections[service_id].remove(websocket)
-            
-            # Удаляем пустые списки
-            if not self.service_connections[service_id]:
-                del self.service_connections[service_id]
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
+        if connection.service_id is None:
+            self.all_connections.discard(connection)
+        else:
+            connections = self.service_connections.get(connection.service_id)
+            if connections is not None:
+                connections.discard(connection)
+                # Удаляем пустые множества
+                if not connections:
+                    del self.service_connections[connection.service_id]
+
+    async def send_personal_message(self, message: bytes, websocket: WebSocket):
         try:
-            await websocket.send_text(message)
+            await websocket.send_bytes(message)
         except Exception as e:
             logger.error(f"Ошибка отправки сообщения WebSocket: {e}")
 
-    async def broadcast_to_all(self, message: str):
-        """Отправить сообщение всем подключенным клиентам"""
-        if self.active_connections:
-            # Создаем задачи для всех соединений
-            tasks = []
-            for connection in self.active_connections[:]:  # Копируем список для безопасности
-                tasks.append(self.send_personal_message(message, connection))
-            
-            # Выполняем все отправки параллельно
-            await asyncio.gather(*tasks, return_exceptions=True)
-
-    async def broadcast_to_service(self, service_id: int, message: str):
-        """Отправить сообщение всем подписчикам конкретного сервиса"""
-        if service_id in self.service_connections:
-            connections = self.service_connections[service_id][:]  # Копируем для безопасности
-            tasks = []
-            for connection in connections:
-                tasks.append(self.send_personal_message(message, connection))
-            
-            # Выполняем все отправки параллельно
-            await asyncio.gather(*tasks, return_exceptions=True)
+    async def enqueue_log(self, log_entry: RequestLogEntry):
+        """
+        Добавить лог в буферы подписчиков (всех логов и конкретного сервиса)
+        
+        Вызывается из общей задачи записи логов, поэтому ничего не отправляет
+        сам - только кладет лог в буфер и будит задачу отправки соединения.
+        """
+        service_connections = self.service_connections.get(log_entry.mock_service_id)
+        if not self.all_connections and not service_connections:
+            return
+        recipients = list(self.all_connections)
+        if service_connections:
+            recipients.extend(service_connections)
+
+        # JSON записи уже закодирован при записи в файл - переиспользуем его
+        payload = log_entry.json_bytes
+        timestamp = orjson.dumps(log_entry.timestamp)
+        for connection in recipients:
+            pending = connection.pending
+            if len(pending) == pending.maxlen:
+                connection.dropped += 1
+            pending.append(payload)
+            connection.pending_timestamp = timestamp
+            if len(pending) == 1 or len(pending) >= self.MAX_PENDING:
+                connection.wakeup.set()
+
+    async def _flush(self, connection: Connection) -> bool:
+        """
+        Отправить накопленные логи пачками не больше MAX_PENDING
+        
+        Возвращает False, если клиент не принял сообщение за SEND_TIMEOUT.
+        """
+        pending = connection.pending
+        if connection.dropped:
+            logger.warning(f"WebSocket клиент не успевает читать логи, пропущено: {connection.dropped}")
+            connection.dropped = 0
+        while pending:
+            items = [pending.popleft() for _ in range(min(len(pending), self.MAX_PENDING))]
+            # Склеиваем уже сериализованные логи без повторного кодирования
+            message = b''.join((
+                b'{"type":"log_batch","items":[',
+                b','.join(items),
+                b'],"timestamp":',
+                connection.pending_timestamp,
+                b'}'
+            ))
+            try:
+                await asyncio.wait_for(
+                    self.send_personal_message(message, connection.websocket), self.SEND_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _flusher(self, connection: Connection):
+        """Отправка буфера соединения: задача спит, пока логов нет"""
+        while True:
+            await connection.wakeup.wait()
+            # Копим пачку FLUSH_INTERVAL, если она не набралась раньше
+            if len(connection.pending) < self.MAX_PENDING:
+                connection.wakeup.clear()
+                try:
+                    await asyncio.wait_for(connection.wakeup.wait(), self.FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            connection.wakeup.clear()
+            if not await self._flush(connection):
+                break
+
+        # Клиент не читает сообщения - отключаем его, чтобы не копить логи
+        logger.warning("WebSocket клиент не принимает сообщения, соединение закрывается")
+        websocket = connection.websocket
+        # Задача завершается сама - disconnect не должен ее отменять
+        connection.flusher_task = None
+        self.disconnect(websocket)
+        try:
+            await asyncio.wait_for(websocket.close(code=1008), self.SEND_TIMEOUT)
+        except Exception:
+            pass
 
 
 manager = ConnectionManager()
 
 
+async def wait_for_disconnect(websocket: WebSocket):
+    """Дождаться закрытия соединения, не декодируя входящие сообщения клиента"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
 @router.websocket("/ws/logs")
 async def websocket_logs_all(websocket: WebSocket):
     """WebSocket для получения всех логов в реальном времени"""
     await manager.connect(websocket)
     
     try:
-        while True:
-            # Ждем сообщения от клиента (например, ping)
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        await wait_for_disconnect(websocket)
     except Exception as e:
         logger.error(f"Ошибка WebSocket: {e}")
+    finally:
         manager.disconnect(websocket)
 
 
@@ -94,41 +198,19 @@ async def websocket_logs_service(websocket: WebSocket, service_id: int):
     await manager.connect(websocket, service_id)
     
     try:
-        while True:
-            # Ждем сообщения от клиента (например, ping)
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        manager.disconnect(websocket, service_id)
+        await wait_for_disconnect(websocket)
     except Exception as e:
         logger.error(f"Ошибка WebSocket для сервиса {service_id}: {e}")
+    finally:
         manager.disconnect(websocket, service_id)
 
 
-async def broadcast_log_message(log_data: Dict[str, Any]):
-    """Отправить лог всем подключенным клиентам"""
-    message = json.dumps({
-        "type": "log",
-        "data": log_data,
-        "timestamp": datetime.now().isoformat()
-    })
-    
-    # Отправляем всем
-    await manager.broadcast_to_all(message)
-    
-    # Отправляем подписчикам конкретного сервиса
-    if log_data.get("mock_service_id"):
-        await manager.broadcast_to_service(log_data["mock_service_id"], message)
-
-
 # Функция для отправки уведомлений о новых логах
 # Эта функция будет вызываться из file_logger
 async def notify_new_log(log_entry: RequestLogEntry):
     """Уведомить WebSocket клиентов о новом логе"""
     try:
-        # Конвертируем RequestLogEntry в dict для совместимости
-        log_data = log_entry.to_dict()
-        
-        await broadcast_log_message(log_data)
+        await manager.enqueue_log(log_entry)
     except Exception as e:
         logger.error(f"Ошибка при отправке уведомления о новом логе: {e}")
 
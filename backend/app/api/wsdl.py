@@ -1,13 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Any
-from app.database import get_db
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Any, Dict, List, Literal, Union
+from app.database import AsyncSessionLocal
 from app.services.wsdl_service import WSDLService, WSDLParseResult
 from app.services.mock_service import MockServiceService
 from app.schemas.mock_service import MockServiceCreate
-from pydantic import BaseModel, Field, validator
+from pydantic import AfterValidator, AnyHttpUrl, BaseModel, Field, field_validator
+import asyncio
+import httpx
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 
@@ -21,37 +22,37 @@ def clean_wsdl_url_for_proxy(wsdl_url: str) -> str:
     Returns:
         str: Очищенный URL для проксирования
     """
-    # Убираем ?wsdl из URL
-    cleaned_url = re.sub(r'\?wsdl$', '', wsdl_url, flags=re.IGNORECASE)
+    cleaned_url = wsdl_url
     
-    # Убираем .wsdl из URL
-    cleaned_url = re.sub(r'\.wsdl$', '', cleaned_url, flags=re.IGNORECASE)
+    # Убираем ?wsdl, затем .wsdl из конца URL (без учета регистра)
+    for suffix in ('?wsdl', '.wsdl'):
+        if cleaned_url[-5:].lower() == suffix:
+            cleaned_url = cleaned_url[:-5]
     
     return cleaned_url
 
 router = APIRouter(prefix="/api/wsdl", tags=["WSDL"])
 
+# Количество сервисов, сохраняемых одной транзакцией при потоковом импорте
+IMPORT_BATCH_SIZE = 50
+
+# SOAP всегда использует POST
+SOAP_METHODS = ("POST",)
+
+# http(s) URL: разбор и проверка хоста/порта выполняются в pydantic-core,
+# дальше по коду URL передается обычной строкой
+WSDLUrl = Annotated[AnyHttpUrl, AfterValidator(str)]
+
 class WSDLParseRequest(BaseModel):
-    wsdl_url: str = Field(..., description="URL WSDL документа")
-    
-    @validator('wsdl_url')
-    def validate_wsdl_url(cls, v):
-        if not v.startswith(('http://', 'https://')):
-            raise ValueError('URL должен начинаться с http:// или https://')
-        return v
+    wsdl_url: WSDLUrl = Field(..., description="URL WSDL документа")
 
 class WSDLImportRequest(BaseModel):
-    wsdl_url: str = Field(..., description="URL WSDL документа")
+    wsdl_url: WSDLUrl = Field(..., description="URL WSDL документа")
     base_path: str = Field(default="/soap", description="Базовый путь для эндпоинтов")
     service_prefix: str = Field(default="", description="Префикс для имен сервисов")
     
-    @validator('wsdl_url')
-    def validate_wsdl_url(cls, v):
-        if not v.startswith(('http://', 'https://')):
-            raise ValueError('URL должен начинаться с http:// или https://')
-        return v
-    
-    @validator('base_path')
+    @field_validator('base_path')
+    @classmethod
     def validate_base_path(cls, v):
         if not v.startswith('/'):
             return f'/{v}'
@@ -84,19 +85,38 @@ class MockServicePreview(BaseModel):
     sample_response: str
     proxy_url: str
 
+class ImportedServiceCreated(BaseModel):
+    id: int
+    name: str
+    path: str
+    operation_name: str
+    soap_action: str
+    status: Literal["created"]
+
+class ImportedServiceFailed(BaseModel):
+    operation_name: str
+    soap_action: str
+    status: Literal["failed"]
+    error: str
+
+class NDJSONResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Общий HTTP клиент приложения (создается в lifespan)"""
+    return request.app.state.http_client
+
 @router.post("/parse", response_model=WSDLParseResponse)
-async def parse_wsdl_url(request: WSDLParseRequest):
+async def parse_wsdl_url(request: WSDLParseRequest, http_client: httpx.AsyncClient = Depends(get_http_client)):
     """
     Парсит WSDL документ по URL и возвращает найденные операции
     """
     try:
-        wsdl_service = WSDLService()
+        wsdl_service = WSDLService(http_client)
         
         logger.info(f"Начинаем парсинг WSDL: {request.wsdl_url}")
         result = await wsdl_service.parse_wsdl_from_url(request.wsdl_url)
         
-        await wsdl_service.close()
-        
         if result.errors:
             logger.error(f"Ошибки при парсинге WSDL: {result.errors}")
         
@@ -106,13 +126,38 @@ async def parse_wsdl_url(request: WSDLParseRequest):
         logger.error(f"Ошибка при парсинге WSDL {request.wsdl_url}: {e}")
         raise HTTPException(status_code=400, detail=f"Ошибка парсинга WSDL: {str(e)}")
 
+def _build_previews(wsdl_service: WSDLService, request: WSDLImportRequest, result: WSDLParseResult) -> List[MockServicePreview]:
+    """Формирует превью сервисов с примерами SOAP запроса и ответа для каждой операции"""
+    # Очищаем WSDL URL для отображения в preview (одинаков для всех операций)
+    proxy_url = clean_wsdl_url_for_proxy(request.wsdl_url)
+    name_prefix = request.service_prefix or result.service_name
+    # Для SOAP все запросы идут по одному эндпоинту
+    endpoint_path = request.base_path
+    generate_request = wsdl_service.generate_soap_envelope
+    generate_response = wsdl_service.generate_soap_response
+    
+    # Данные сформированы нами же - повторная валидация конструктором не нужна
+    return [
+        MockServicePreview.model_construct(
+            name=f"{name_prefix}_{operation.name}",
+            path=endpoint_path,
+            methods=SOAP_METHODS,
+            operation_name=operation.name,
+            soap_action=operation.soap_action,
+            sample_request=generate_request(operation),
+            sample_response=generate_response(operation),
+            proxy_url=proxy_url
+        )
+        for operation in result.operations
+    ]
+
 @router.post("/preview", response_model=List[MockServicePreview])
-async def preview_wsdl_import(request: WSDLImportRequest):
+async def preview_wsdl_import(request: WSDLImportRequest, http_client: httpx.AsyncClient = Depends(get_http_client)):
     """
     Предварительный просмотр mock сервисов которые будут созданы из WSDL
     """
     try:
-        wsdl_service = WSDLService()
+        wsdl_service = WSDLService(http_client)
         
         logger.info(f"Предварительный просмотр импорта WSDL: {request.wsdl_url}")
         result = await wsdl_service.parse_wsdl_from_url(request.wsdl_url)
@@ -120,38 +165,9 @@ async def preview_wsdl_import(request: WSDLImportRequest):
         if result.errors:
             raise HTTPException(status_code=400, detail=f"Ошибки парсинга WSDL: {', '.join(result.errors)}")
         
-        previews = []
-        
-        for operation in result.operations:
-            # Формируем путь для эндпоинта - для SOAP все запросы идут по одному эндпоинту
-            if request.service_prefix:
-                service_name = f"{request.service_prefix}_{operation.name}"
-            else:
-                service_name = f"{result.service_name}_{operation.name}"
-            
-            endpoint_path = request.base_path
-            
-            # Очищаем WSDL URL для отображения в preview
-            proxy_url = clean_wsdl_url_for_proxy(request.wsdl_url)
-            
-            # Генерируем примеры
-            sample_request = wsdl_service.generate_soap_envelope(operation)
-            sample_response = wsdl_service.generate_soap_response(operation)
-            
-            preview = MockServicePreview(
-                name=service_name,
-                path=endpoint_path,
-                methods=["POST"],  # SOAP всегда использует POST
-                operation_name=operation.name,
-                soap_action=operation.soap_action,
-                sample_request=sample_request,
-                sample_response=sample_response,
-                proxy_url=proxy_url
-            )
-            
-            previews.append(preview)
-        
-        await wsdl_service.close()
+        # Генерация примеров - чистый Python (строки и словари) на весь список операций:
+        # выполняем ее в отдельном потоке, чтобы не блокировать event loop на больших WSDL
+        previews = await asyncio.to_thread(_build_previews, wsdl_service, request, result)
         
         logger.info(f"Создан предварительный просмотр для {len(previews)} операций")
         return previews
@@ -162,14 +178,46 @@ async def preview_wsdl_import(request: WSDLImportRequest):
         logger.error(f"Ошибка при создании предварительного просмотра: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка создания предварительного просмотра: {str(e)}")
 
-@router.post("/import", response_model=List[Dict[str, Any]])
-async def import_wsdl_services(request: WSDLImportRequest, db: AsyncSession = Depends(get_db)):
+def _import_entry(operation, mock_service=None, error: str = None) -> bytes:
+    """Строка NDJSON с результатом импорта одной операции"""
+    if mock_service is not None:
+        entry = ImportedServiceCreated.model_construct(
+            id=mock_service.id,
+            name=mock_service.name,
+            path=mock_service.path,
+            operation_name=operation.name,
+            soap_action=operation.soap_action,
+            status="created"
+        )
+    else:
+        entry = ImportedServiceFailed.model_construct(
+            operation_name=operation.name,
+            soap_action=operation.soap_action,
+            status="failed",
+            error=error
+        )
+    return entry.model_dump_json().encode() + b"\n"
+
+@router.post(
+    "/import",
+    response_class=NDJSONResponse,
+    responses={200: {
+        "model": Union[ImportedServiceCreated, ImportedServiceFailed],
+        "description": "Поток NDJSON: по одной строке на каждую операцию WSDL"
+    }}
+)
+async def import_wsdl_services(
+    request: WSDLImportRequest,
+    http_client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
     Импортирует SOAP операции из WSDL как mock сервисы
+    
+    Результаты отдаются потоком NDJSON (по строке на операцию) по мере
+    сохранения очередной пачки сервисов в БД.
     """
     try:
-        wsdl_service = WSDLService()
-        mock_service_service = MockServiceService(db)
+        wsdl_service = WSDLService(http_client)
         
         logger.info(f"Начинаем импорт WSDL: {request.wsdl_url}")
         result = await wsdl_service.parse_wsdl_from_url(request.wsdl_url)
@@ -177,71 +225,89 @@ async def import_wsdl_services(request: WSDLImportRequest, db: AsyncSession = De
         if result.errors:
             raise HTTPException(status_code=400, detail=f"Ошибки парсинга WSDL: {', '.join(result.errors)}")
         
-        imported_services = []
-        
-        for operation in result.operations:
-            try:
-                # Формируем имя сервиса
-                if request.service_prefix:
-                    service_name = f"{request.service_prefix}_{operation.name}"
-                else:
-                    service_name = f"{result.service_name}_{operation.name}"
-                
-                # Формируем путь эндпоинта - для SOAP все запросы идут по одному эндпоинту
-                endpoint_path = request.base_path
-                
-                # Очищаем WSDL URL для использования как proxy URL
-                proxy_url = clean_wsdl_url_for_proxy(request.wsdl_url)
-                
-                # Создаем mock сервис с проксированием
-                mock_data = MockServiceCreate(
-                    name=service_name,
-                    path=endpoint_path,
-                    methods=["POST"],
-                    strategy="proxy",
-                    service_type="soap",  # Устанавливаем тип сервиса как SOAP
-                    proxy_url=proxy_url,  # Используем очищенный URL для проксирования
-                    proxy_delay=0.0,
-                    is_active=True
-                )
-                
-                # Сохраняем в БД
-                mock_service = await mock_service_service.create_mock_service(mock_data)
-                
-                imported_services.append({
-                    "id": mock_service.id,
-                    "name": mock_service.name,
-                    "path": mock_service.path,
-                    "operation_name": operation.name,
-                    "soap_action": operation.soap_action,
-                    "status": "created"
-                })
-                
-                logger.info(f"Создан mock сервис для операции {operation.name}: {mock_service.id}")
-                
-            except Exception as e:
-                error_msg = f"Ошибка создания сервиса для операции {operation.name}: {str(e)}"
-                logger.error(error_msg)
-                
-                imported_services.append({
-                    "operation_name": operation.name,
-                    "soap_action": operation.soap_action,
-                    "status": "failed",
-                    "error": error_msg
-                })
-        
-        await wsdl_service.close()
-        
-        success_count = len([s for s in imported_services if s.get("status") == "created"])
-        logger.info(f"Импорт завершен: {success_count}/{len(result.operations)} операций")
-        
-        return imported_services
-        
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Ошибка импорта WSDL: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка импорта WSDL: {str(e)}")
+    
+    return NDJSONResponse(_import_operations(request, result))
+
+async def _import_operations(request: WSDLImportRequest, result: WSDLParseResult):
+    """Создает mock сервисы пачками по IMPORT_BATCH_SIZE и отдает результат каждой операции"""
+    # Очищаем WSDL URL для использования как proxy URL (одинаков для всех операций)
+    proxy_url = clean_wsdl_url_for_proxy(request.wsdl_url)
+    success_count = 0
+    
+    # Сессия открывается здесь: генератор работает уже после выхода из обработчика
+    async with AsyncSessionLocal() as db:
+        mock_service_service = MockServiceService(db)
+        
+        for batch_start in range(0, len(result.operations), IMPORT_BATCH_SIZE):
+            batch = result.operations[batch_start:batch_start + IMPORT_BATCH_SIZE]
+            entries = []
+            pending = []  # (индекс в entries, операция, данные сервиса)
+            
+            for operation in batch:
+                try:
+                    # Формируем имя сервиса
+                    if request.service_prefix:
+                        service_name = f"{request.service_prefix}_{operation.name}"
+                    else:
+                        service_name = f"{result.service_name}_{operation.name}"
+                    
+                    # Формируем путь эндпоинта - для SOAP все запросы идут по одному эндпоинту
+                    endpoint_path = request.base_path
+                    
+                    # Создаем mock сервис с проксированием
+                    mock_data = MockServiceCreate(
+                        name=service_name,
+                        path=endpoint_path,
+                        methods=["POST"],
+                        strategy="proxy",
+                        service_type="soap",  # Устанавливаем тип сервиса как SOAP
+                        proxy_url=proxy_url,  # Используем очищенный URL для проксирования
+                        proxy_delay=0.0,
+                        is_active=True
+                    )
+                    
+                    pending.append((len(entries), operation, mock_data))
+                    entries.append(None)
+                    
+                except Exception as e:
+                    error_msg = f"Ошибка создания сервиса для операции {operation.name}: {str(e)}"
+                    logger.error(error_msg)
+                    entries.append(_import_entry(operation, error=error_msg))
+            
+            # Сохраняем пачку сервисов в БД одной транзакцией
+            try:
+                rejected = []
+                created_services = await mock_service_service.bulk_create_mock_services(
+                    [mock_data for _, _, mock_data in pending], rejected=rejected
+                )
+                # Отклоненные операции отчитываются ошибкой, созданные сервисы идут в порядке остальных
+                rejected_errors = dict(rejected)
+                created_iter = iter(created_services)
+                for position, (index, operation, _) in enumerate(pending):
+                    if position in rejected_errors:
+                        error_msg = f"Ошибка создания сервиса для операции {operation.name}: {rejected_errors[position]}"
+                        logger.error(error_msg)
+                        entries[index] = _import_entry(operation, error=error_msg)
+                        continue
+                    mock_service = next(created_iter)
+                    entries[index] = _import_entry(operation, mock_service)
+                    logger.info(f"Создан mock сервис для операции {operation.name}: {mock_service.id}")
+                success_count += len(created_services)
+            except Exception as e:
+                await db.rollback()
+                for index, operation, _ in pending:
+                    error_msg = f"Ошибка создания сервиса для операции {operation.name}: {str(e)}"
+                    logger.error(error_msg)
+                    entries[index] = _import_entry(operation, error=error_msg)
+            
+            yield b"".join(entries)
+    
+    logger.info(f"Импорт завершен: {success_count}/{len(result.operations)} операций")
 
 @router.get("/test-urls")
 async def get_test_wsdl_urls():
@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import asyncio
 import os
 
 # Получаем путь к базе данных
@@ -10,18 +11,102 @@ os.makedirs(DATABASE_DIR, exist_ok=True)
 DATABASE_URL = f"sqlite:///{os.path.join(DATABASE_DIR, 'mock_service.db')}"
 ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(DATABASE_DIR, 'mock_service.db')}"
 
-# Синхронный движок для миграций
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Параметры пула соединений асинхронного движка
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "5"))
 
-# Асинхронный движок для основной работы
-async_engine = create_async_engine(ASYNC_DATABASE_URL)
+# Асинхронный движок для основной работы.
+# Для файловой SQLite aiosqlite по умолчанию использует NullPool и открывает
+# новое соединение (и поток) на каждый запрос - задаем пул явно.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+    # Соединения пула используются из разных задач, как и у синхронного движка
+    connect_args={"check_same_thread": False},
+)
 AsyncSessionLocal = async_sessionmaker(
     async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Настройки SQLite для каждого нового соединения: WAL не блокирует читателей
+# при записи, synchronous=NORMAL в режиме WAL убирает fsync на каждый commit
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def get_sync_engine():
+    """
+    Синхронный движок для миграций и служебных скриптов
+    
+    Приложение работает только через async_engine, поэтому синхронный
+    движок создается по требованию, а не при импорте модуля.
+    """
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
 Base = declarative_base()
 
+
+def add_missing_columns(sync_conn):
+    """
+    Добавить в существующие таблицы колонки, появившиеся в моделях позже
+    
+    create_all не изменяет уже созданные таблицы, поэтому для новых колонок
+    выполняется ALTER TABLE ... ADD COLUMN (со строковым server_default, если он задан).
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(sync_conn.dialect)}"
+            default = column.server_default.arg if column.server_default is not None else None
+            if isinstance(default, str):
+                ddl += f" NOT NULL DEFAULT '{default}'" if not column.nullable else f" DEFAULT '{default}'"
+            sync_conn.execute(text(ddl))
+
+
+def add_missing_indexes(sync_conn):
+    """Создать индексы моделей, которых еще нет в существующих таблицах"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def warm_up_pool(min_size: int = DB_POOL_MIN_SIZE):
+    """Заранее открыть min_size соединений, чтобы первые запросы не ждали подключения"""
+    count = min(min_size, DB_POOL_SIZE)
+    if count <= 0:
+        return
+    connections = await asyncio.gather(*(async_engine.connect() for _ in range(count)))
+    await asyncio.gather(*(conn.close() for conn in connections))
+
 # Dependency для получения сессии БД
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -1,19 +1,30 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
+import asyncio
+import httpx
 import logging
+import orjson
 import os
+import queue
 from contextlib import asynccontextmanager
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-from app.database import async_engine, Base
+from app.database import async_engine, Base, warm_up_pool, add_missing_columns, add_missing_indexes
+from app.services.file_logger import parse_size
 from app.api import mock_services, mock_handler, websocket, swagger, server_info, wsdl
 from app.models import mock_service  # Импортируем модели для создания таблиц
 
 
 def setup_application_logging():
-    """Настройка логирования приложения с ротацией"""
+    """
+    Настройка логирования приложения с ротацией
+    
+    Запись в файл и консоль выполняется в отдельном потоке QueueListener,
+    чтобы вызовы логгера не блокировали event loop.
+    """
     # Создаем директорию для логов
     logs_dir = os.getenv("LOG_DIR", "logs")
     os.makedirs(logs_dir, exist_ok=True)
@@ -23,18 +34,6 @@ def setup_application_logging():
     max_size_str = os.getenv("LOG_MAX_SIZE", "50MB")
     backup_count = int(os.getenv("LOG_BACKUP_COUNT", "10"))
     
-    # Парсим размер
-    def parse_size(size_str: str) -> int:
-        size_str = size_str.upper().strip()
-        if size_str.endswith('KB'):
-            return int(size_str[:-2]) * 1024
-        elif size_str.endswith('MB'):
-            return int(size_str[:-2]) * 1024 * 1024
-        elif size_str.endswith('GB'):
-            return int(size_str[:-2]) * 1024 * 1024 * 1024
-        else:
-            return int(size_str)
-    
     max_bytes = parse_size(max_size_str)
     
     # Настраиваем корневой логгер
@@ -58,23 +57,29 @@ def setup_application_logging():
         encoding='utf-8'
     )
     file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
     
     # Консольный вывод (для Docker)
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
     
-    return root_logger
+    # Корневой логгер только кладет записи в очередь, диск пишет фоновый поток
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(QueueHandler(log_queue))
+    # Поток записи запускается в lifespan; накопленные до старта записи он допишет сразу
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    
+    return root_logger, listener
 
 
 # Настройка логирования
-logger = setup_application_logging()
+logger, log_listener = setup_application_logging()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Инициализация и завершение работы приложения"""
+    log_listener.start()
+    
     # Создание таблиц при запуске
     logger.info("Запуск Mock Service...")
     logger.info(f"Логи сохраняются в: {os.getenv('LOG_DIR', 'logs')}")
@@ -83,12 +88,34 @@ async def lifespan(app: FastAPI):
     
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(add_missing_indexes)
     logger.info("Таблицы созданы успешно")
     
+    # Прогрев пула соединений с БД
+    await warm_up_pool()
+    
+    # Общий HTTP клиент для загрузки внешних документов (WSDL):
+    # соединения и TLS сессии переиспользуются между запросами
+    app.state.http_client = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+    )
+    
+    # Фоновая запись логов запросов
+    log_writer_task = asyncio.create_task(mock_handler.log_writer_loop())
+    
     yield
     
     # Очистка при завершении
     logger.info("Завершение работы Mock Service...")
+    log_writer_task.cancel()
+    await mock_handler.flush_log_queue()
+    swagger.shutdown_swagger_pool()
+    await app.state.http_client.aclose()
+    await mock_handler.mock_processor.close()
+    await async_engine.dispose()
+    log_listener.stop()
 
 
 # Создание приложения FastAPI
@@ -122,6 +149,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     openapi_url="/openapi.json",
     lifespan=lifespan
 )
@@ -135,6 +163,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """
+    GZip только для API управления (превью WSDL, логи, списки сервисов)
+    
+    Ответы mock эндпоинтов отдаются клиенту в том виде, в котором настроены,
+    а потоковый импорт WSDL не должен буферизоваться компрессором.
+    """
+    
+    def __init__(self, app, prefixes, exclude=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.prefixes = tuple(prefixes)
+        self.exclude = frozenset(exclude)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path.startswith(self.prefixes) and path not in self.exclude:
+                await super().__call__(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(
+    APIGZipMiddleware,
+    prefixes=(mock_services.router.prefix, swagger.router.prefix, wsdl.router.prefix),
+    exclude=(f"{wsdl.router.prefix}/import",),
+    minimum_size=1024,
+    compresslevel=6,
+)
+
 # Подключение роутеров
 app.include_router(server_info.router)
 app.include_router(mock_services.router)
@@ -146,10 +206,8 @@ app.include_router(websocket.router)
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Главная страница
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    return """
+# Главная страница (не меняется - кодируем ее один раз при импорте)
+ROOT_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -215,12 +273,21 @@ async def root():
         </div>
     </body>
     </html>
-    """
+    """.encode("utf-8")
+
+
+@app.get("/", response_class=HTMLResponse)
+async def root():
+    return HTMLResponse(content=ROOT_HTML)
+
+
+HEALTH_RESPONSE = orjson.dumps({"status": "healthy", "message": "Mock Service работает"})
+
 
 @app.get("/health")
 async def health_check():
     """Проверка состояния сервиса"""
-    return {"status": "healthy", "message": "Mock Service работает"}
+    return Response(content=HEALTH_RESPONSE, media_type="application/json")
 
 # Добавляем обработчик mock запросов в конце, чтобы он не перехватывал API маршруты
 app.include_router(mock_handler.router) 
\ No newline at end of file
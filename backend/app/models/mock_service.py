@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, JSON, Index
 from sqlalchemy.sql import func
 from app.database import Base
 from enum import Enum
@@ -16,8 +16,21 @@ class ServiceType(str, Enum):
     SOAP = "soap"
 
 
+class LogLevel(str, Enum):
+    NONE = "none"        # запросы не логируются
+    SUMMARY = "summary"  # только метод, путь, статус и время обработки
+    FULL = "full"        # заголовки, тела запроса и ответа
+
+
 class MockService(Base):
     __tablename__ = "mock_services"
+    # Серверные значения (created_at) возвращаются прямо из INSERT ... RETURNING,
+    # без отдельного SELECT после пакетной вставки
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # Выборка активных сервисов (построение индекса маршрутов) и поиск по пути
+        Index("ix_mock_services_active_path", "is_active", "path"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
@@ -42,9 +55,11 @@ class MockService(Base):
     conditional_delay = Column(Float, default=0.0)
     conditional_status_code = Column(Integer, default=200)
     conditional_headers = Column(JSON, nullable=True)
+    conditional_cache_ttl = Column(Float, nullable=False, default=0.0, server_default="0")  # кэш ответов в секундах, 0 - выключен
     
     # Общие настройки
     is_active = Column(Boolean, default=True)
+    log_level = Column(String(20), nullable=False, default=LogLevel.FULL.value, server_default=LogLevel.FULL.value)  # LogLevel
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -67,7 +82,9 @@ class MockService(Base):
             "conditional_delay": self.conditional_delay,
             "conditional_status_code": self.conditional_status_code,
             "conditional_headers": self.conditional_headers,
+            "conditional_cache_ttl": self.conditional_cache_ttl,
             "is_active": self.is_active,
+            "log_level": self.log_level,
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
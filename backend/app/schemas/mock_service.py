@@ -1,7 +1,19 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
-from app.models.mock_service import ResponseStrategy, ServiceType
+from app.models.mock_service import ResponseStrategy, ServiceType, LogLevel
+
+
+ALLOWED_METHODS = frozenset({'GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS'})
+
+
+def _normalize_methods(methods: List[str]) -> List[str]:
+    """Привести HTTP методы к верхнему регистру и проверить допустимость"""
+    upper = [method.upper() for method in methods]
+    for method, normalized in zip(methods, upper):
+        if normalized not in ALLOWED_METHODS:
+            raise ValueError(f'Недопустимый HTTP метод: {method}')
+    return upper
 
 
 class ConditionalResponse(BaseModel):
@@ -13,21 +25,24 @@ class ConditionalResponse(BaseModel):
     headers: Optional[Dict[str, str]] = None
     delay: float = Field(default=0.0, ge=0)
     
-    @validator('response')
-    def validate_static_response(cls, v, values):
-        if values.get('response_type') == 'static' and not v:
+    @field_validator('response')
+    @classmethod
+    def validate_static_response(cls, v, info: ValidationInfo):
+        if info.data.get('response_type') == 'static' and not v:
             raise ValueError('Для статического ответа необходимо указать response')
         return v
     
-    @validator('proxy_url')
-    def validate_proxy_response(cls, v, values):
-        if values.get('response_type') == 'proxy' and not v:
+    @field_validator('proxy_url')
+    @classmethod
+    def validate_proxy_response(cls, v, info: ValidationInfo):
+        if info.data.get('response_type') == 'proxy' and not v:
             raise ValueError('Для проксирования необходимо указать proxy_url')
         return v
     
-    @validator('headers')
-    def validate_proxy_headers(cls, v, values):
-        if values.get('response_type') == 'proxy' and v:
+    @field_validator('headers')
+    @classmethod
+    def validate_proxy_headers(cls, v, info: ValidationInfo):
+        if info.data.get('response_type') == 'proxy' and v:
             # Для проксирования заголовки игнорируются, но не вызываем ошибку
             # Просто логируем предупреждение
             import logging
@@ -39,20 +54,19 @@ class ConditionalResponse(BaseModel):
 class MockServiceBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
     path: str = Field(..., min_length=1, max_length=1000)
-    methods: List[str] = Field(..., min_items=1)
+    methods: List[str] = Field(..., min_length=1)
     strategy: ResponseStrategy
     service_type: ServiceType = Field(default=ServiceType.REST, description="Тип сервиса: REST или SOAP")
     is_active: bool = True
+    log_level: LogLevel = Field(default=LogLevel.FULL, description="Детализация логов запросов: none, summary или full")
 
-    @validator('methods')
+    @field_validator('methods')
+    @classmethod
     def validate_methods(cls, v):
-        allowed_methods = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS']
-        for method in v:
-            if method.upper() not in allowed_methods:
-                raise ValueError(f'Недопустимый HTTP метод: {method}')
-        return [method.upper() for method in v]
+        return _normalize_methods(v)
 
-    @validator('path')
+    @field_validator('path')
+    @classmethod
     def validate_path(cls, v):
         if not v.startswith('/'):
             return f'/{v}'
@@ -76,22 +90,26 @@ class MockServiceCreate(MockServiceBase):
     conditional_delay: float = Field(default=0.0, ge=0)
     conditional_status_code: int = Field(default=200, ge=100, le=599)
     conditional_headers: Optional[Dict[str, str]] = None
+    conditional_cache_ttl: float = Field(default=0.0, ge=0, description="Время кэширования ответов условной стратегии в секундах (0 - без кэша)")
 
-    @validator('proxy_url')
-    def validate_proxy_settings(cls, v, values):
-        if values.get('strategy') == ResponseStrategy.PROXY and not v:
+    @field_validator('proxy_url')
+    @classmethod
+    def validate_proxy_settings(cls, v, info: ValidationInfo):
+        if info.data.get('strategy') == ResponseStrategy.PROXY and not v:
             raise ValueError('Для proxy стратегии необходимо указать proxy_url')
         return v
 
-    @validator('static_response')
-    def validate_static_settings(cls, v, values):
-        if values.get('strategy') == ResponseStrategy.STATIC and not v:
+    @field_validator('static_response')
+    @classmethod
+    def validate_static_settings(cls, v, info: ValidationInfo):
+        if info.data.get('strategy') == ResponseStrategy.STATIC and not v:
             raise ValueError('Для static стратегии необходимо указать static_response')
         return v
 
-    @validator('condition_code')
-    def validate_conditional_settings(cls, v, values):
-        if values.get('strategy') == ResponseStrategy.CONDITIONAL and not v:
+    @field_validator('condition_code')
+    @classmethod
+    def validate_conditional_settings(cls, v, info: ValidationInfo):
+        if info.data.get('strategy') == ResponseStrategy.CONDITIONAL and not v:
             raise ValueError('Для conditional стратегии необходимо указать condition_code')
         return v
 
@@ -102,6 +120,7 @@ class MockServiceUpdate(BaseModel):
     methods: Optional[List[str]] = None
     strategy: Optional[ResponseStrategy] = None
     is_active: Optional[bool] = None
+    log_level: Optional[LogLevel] = None
     
     # Proxy настройки
     proxy_url: Optional[str] = None
@@ -119,18 +138,17 @@ class MockServiceUpdate(BaseModel):
     conditional_delay: Optional[float] = Field(None, ge=0)
     conditional_status_code: Optional[int] = Field(None, ge=100, le=599)
     conditional_headers: Optional[Dict[str, str]] = None
+    conditional_cache_ttl: Optional[float] = Field(None, ge=0)
 
-    @validator('methods')
+    @field_validator('methods')
+    @classmethod
     def validate_methods(cls, v):
         if v is None:
             return v
-        allowed_methods = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS']
-        for method in v:
-            if method.upper() not in allowed_methods:
-                raise ValueError(f'Недопустимый HTTP метод: {method}')
-        return [method.upper() for method in v]
+        return _normalize_methods(v)
 
-    @validator('path')
+    @field_validator('path')
+    @classmethod
     def validate_path(cls, v):
         if v is None:
             return v
@@ -138,6 +156,14 @@ class MockServiceUpdate(BaseModel):
             return f'/{v}'
         return v
 
+    @field_validator('log_level', 'conditional_cache_ttl')
+    @classmethod
+    def validate_not_null(cls, v, info: ValidationInfo):
+        # Поля можно не передавать, но явный null недопустим - колонки NOT NULL
+        if v is None:
+            raise ValueError(f'Поле {info.field_name} не может быть null')
+        return v
+
 
 class MockServiceResponse(MockServiceBase):
     id: int
@@ -153,9 +179,9 @@ class MockServiceResponse(MockServiceBase):
     conditional_delay: float
     conditional_status_code: int
     conditional_headers: Optional[Dict[str, str]] = None
+    conditional_cache_ttl: float = 0.0
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
  
\ No newline at end of file
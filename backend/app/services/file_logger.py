@@ -1,11 +1,19 @@
-import json
+import atexit
 import logging
+import mmap
 import os
+import queue
 from datetime import datetime
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass, asdict
-import glob
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass, fields
+from functools import cached_property
+from array import array
+from collections import deque
+from itertools import count, islice
+import threading
+import time
+import orjson
 import re
 
 
@@ -27,22 +35,132 @@ class RequestLogEntry:
     timestamp: str
     # Дополнительная информация для проксирования
     proxy_info: Optional[Dict[str, Any]] = None  # Информация о проксировании
+    body_len: Optional[int] = None  # Исходный размер тела запроса (тело в логе может быть обрезано)
 
-    def to_dict(self):
-        return asdict(self)
+    @cached_property
+    def json_bytes(self) -> bytes:
+        """JSON представление записи (кодируется один раз для файла и WebSocket)"""
+        # orjson сериализует dataclass напрямую, без глубокой копии через asdict
+        return orjson.dumps(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Поверхностный словарь полей записи
+        
+        Вложенные словари (заголовки, параметры, proxy_info) не копируются -
+        после логирования они не изменяются, и вызывающий код не должен их менять.
+        """
+        return {name: getattr(self, name) for name in _LOG_ENTRY_FIELDS}
+
+
+_LOG_ENTRY_FIELDS = tuple(field.name for field in fields(RequestLogEntry))
+
+# mock_service_id - второе поле записи, поэтому ищем его только в начале строки
+_SERVICE_ID_RE = re.compile(rb'"mock_service_id":\s*(null|-?\d+)')
+_SERVICE_ID_SCAN_BYTES = 256
+
+
+class _LogFileIndex:
+    """
+    Индекс строк одного файла лога
+    
+    Для каждой полной строки хранит смещение и длину, отдельно для всех
+    записей и для записей каждого сервиса. Файл лога только дописывается,
+    поэтому индекс достраивается с позиции size.
+    
+    Индекс привязан к (st_dev, st_ino), а номер inode удаленного при ротации
+    или очистке файла может достаться новому файлу. Поэтому запоминается
+    начало проиндексированного содержимого (head) и сверяется перед
+    использованием индекса.
+    """
+    
+    __slots__ = ("size", "head", "starts", "lengths", "by_service")
+    
+    # Сколько байт начала файла хранится для проверки, что файл тот же
+    HEAD_SIZE = 256
+    
+    def __init__(self):
+        self.size = 0
+        self.head = b''
+        self.starts = array('q')
+        self.lengths = array('q')
+        self.by_service: Dict[Optional[int], Tuple[array, array]] = {}
+    
+    def extend(self, f):
+        """
+        Проиндексировать строки, дописанные после последнего обновления
+        
+        Файл отображается в память (mmap): границы строк и mock_service_id
+        ищутся прямо в page cache, без копирования строк в буферы Python.
+        """
+        fd = f.fileno()
+        if os.fstat(fd).st_size <= self.size:
+            return
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            offset = self.size
+            while True:
+                end = mm.find(b'\n', offset)
+                if end < 0:
+                    # Строка еще дописывается - проиндексируем в следующий раз
+                    break
+                end += 1
+                service_id = _parse_service_id(mm, offset, end)
+                if service_id is not False:
+                    length = end - offset
+                    self.starts.append(offset)
+                    self.lengths.append(length)
+                    starts, lengths = self.by_service.setdefault(service_id, (array('q'), array('q')))
+                    starts.append(offset)
+                    lengths.append(length)
+                offset = end
+            if len(self.head) < self.HEAD_SIZE and offset > len(self.head):
+                # Записи содержат id и время, поэтому начало файла уникально
+                self.head = mm[:min(offset, self.HEAD_SIZE)]
+        self.size = offset
+    
+    def matches(self, fd: int) -> bool:
+        """Проиндексирован ли именно этот файл, а не прежний с тем же inode"""
+        return not self.head or os.pread(fd, len(self.head), 0) == self.head
+    
+    def lines(self, service_id: Optional[int] = None) -> Tuple[array, array]:
+        """Смещения и длины строк (всех или только указанного сервиса)"""
+        if service_id is None:
+            return self.starts, self.lengths
+        return self.by_service.get(service_id, (array('q'), array('q')))
+
+
+def _parse_service_id(buf, start: int = 0, end: Optional[int] = None):
+    """
+    mock_service_id из JSON строки лога buf[start:end]
+    
+    Возвращает False, если строка пустая или не является записью лога.
+    """
+    if end is None:
+        end = len(buf)
+    match = _SERVICE_ID_RE.search(buf, start, min(end, start + _SERVICE_ID_SCAN_BYTES))
+    if match:
+        value = match.group(1)
+        return None if value == b'null' else int(value)
+    try:
+        return orjson.loads(buf[start:end]).get("mock_service_id")
+    except (ValueError, AttributeError):
+        return False
+
+
+# Сколько должно пройти после изменения директории логов, чтобы доверять кэшу списка файлов
+LOG_FILES_CACHE_SETTLE_NS = 1_000_000_000
+
+_SIZE_RE = re.compile(r"\s*(\d+)\s*([KMG]?B)?\s*", re.IGNORECASE)
+_SIZE_UNITS = {None: 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
 
 
 def parse_size(size_str: str) -> int:
-    """Парсинг размера из строки типа '10MB', '1GB'"""
-    size_str = size_str.upper().strip()
-    if size_str.endswith('KB'):
-        return int(size_str[:-2]) * 1024
-    elif size_str.endswith('MB'):
-        return int(size_str[:-2]) * 1024 * 1024
-    elif size_str.endswith('GB'):
-        return int(size_str[:-2]) * 1024 * 1024 * 1024
-    else:
-        return int(size_str)  # Считаем байтами
+    """Парсинг размера из строки типа '10MB', '1GB' (без суффикса - байты)"""
+    match = _SIZE_RE.fullmatch(size_str)
+    if match is None:
+        raise ValueError(f"Некорректный размер: {size_str!r}")
+    unit = match[2]
+    return int(match[1]) * _SIZE_UNITS[unit.upper() if unit else None]
 
 
 class FileLogger:
@@ -72,6 +190,21 @@ class FileLogger:
         # Создаем директорию если не существует
         os.makedirs(self.logs_dir, exist_ok=True)
         
+        # Индексы строк файлов логов по (st_dev, st_ino): при ротации файл
+        # переименовывается, но inode и уже построенный индекс сохраняются
+        self._indexes: Dict[Tuple[int, int], _LogFileIndex] = {}
+        
+        # Последние записанные логи (новые слева): первые страницы общего
+        # списка логов отдаются из памяти без чтения файлов
+        self._recent: deque = deque(maxlen=int(os.getenv("LOG_RECENT_CACHE", "2000")))
+        self._recent_lock = threading.Lock()
+        
+        # Порядковый номер для уникальных ID логов
+        self._log_seq = count()
+        
+        # (mtime_ns директории логов, список файлов) - см. _get_log_files
+        self._log_files_cache: Optional[Tuple[int, List[str]]] = None
+        
         # Настраиваем ротирующий файловый обработчик
         log_file_path = os.path.join(self.logs_dir, "requests.log")
         self._setup_logger(log_file_path)
@@ -121,14 +254,28 @@ class FileLogger:
         formatter = logging.Formatter('%(message)s')
         handler.setFormatter(formatter)
         
-        self.logger.addHandler(handler)
+        # Запись в файл и ротация выполняются в отдельном потоке: логгер
+        # только кладет готовую строку в очередь и не блокирует event loop
+        log_queue = queue.SimpleQueue()
+        self._listener = QueueListener(log_queue, handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+        
+        self.logger.addHandler(QueueHandler(log_queue))
         self.logger.propagate = False  # Не передавать в родительские логгеры
     
+    def flush(self):
+        """Дождаться записи в файл всех логов, стоящих в очереди"""
+        # stop() обрабатывает очередь до конца и завершает поток
+        self._listener.stop()
+        self._listener.start()
+    
     def log_request(self, mock_service_id: Optional[int], mock_service_name: Optional[str],
                    path: str, method: str, headers: Dict[str, Any], query_params: Dict[str, Any],
                    body: str, response_status: int, response_body: str, 
                    response_headers: Dict[str, str], processing_time: float,
-                   proxy_info: Optional[Dict[str, Any]] = None) -> RequestLogEntry:
+                   proxy_info: Optional[Dict[str, Any]] = None,
+                   body_len: Optional[int] = None) -> RequestLogEntry:
         """
         Логирование запроса в файл
         
@@ -143,15 +290,12 @@ class FileLogger:
                     "proxy_time": 0.5,
                     "proxy_error": "error message if any"
                 }
+            body_len: Исходный размер тела запроса в байтах
         
         Returns:
             RequestLogEntry: Объект с данными лога
         """
-        # Генерируем уникальный ID для лога
-        log_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
-        
-        log_entry = RequestLogEntry(
-            id=log_id,
+        log_entry = self._build_entry(
             mock_service_id=mock_service_id,
             mock_service_name=mock_service_name,
             path=path,
@@ -163,15 +307,44 @@ class FileLogger:
             response_body=response_body,
             response_headers=response_headers,
             processing_time=processing_time,
-            timestamp=datetime.now().isoformat(),
-            proxy_info=proxy_info
+            proxy_info=proxy_info,
+            body_len=body_len
         )
         
         # Записываем в файл как JSON строку
-        self.logger.info(json.dumps(log_entry.to_dict(), ensure_ascii=False))
+        self.logger.info(log_entry.json_bytes.decode())
+        with self._recent_lock:
+            self._recent.appendleft(log_entry)
         
         return log_entry
     
+    def log_requests(self, records: List[Dict[str, Any]]) -> List[RequestLogEntry]:
+        """
+        Пакетное логирование запросов одной записью в файл
+        
+        Args:
+            records: Список аргументов log_request в виде словарей
+        
+        Returns:
+            List[RequestLogEntry]: Объекты с данными логов
+        """
+        log_entries = [self._build_entry(**record) for record in records]
+        if log_entries:
+            self.logger.info(b'\n'.join(log_entry.json_bytes for log_entry in log_entries).decode())
+            with self._recent_lock:
+                self._recent.extendleft(log_entries)
+        return log_entries
+    
+    def _build_entry(self, **fields) -> RequestLogEntry:
+        """Создание записи лога с уникальным ID и временем"""
+        # ID: время в наносекундах + порядковый номер - уникален в пределах процесса
+        # даже для записей с одинаковым временем и сортируется как строка
+        now_ns = time.time_ns()
+        log_id = f"{now_ns:x}{next(self._log_seq):08x}"
+        timestamp = datetime.fromtimestamp(now_ns / 1e9).isoformat()
+        
+        return RequestLogEntry(id=log_id, timestamp=timestamp, **fields)
+    
     def get_logs(self, service_id: Optional[int] = None, skip: int = 0, limit: int = 100) -> List[RequestLogEntry]:
         """
         Получение логов из файлов
@@ -184,71 +357,224 @@ class FileLogger:
         Returns:
             List[RequestLogEntry]: Список логов
         """
-        logs = []
+        if service_id is None:
+            with self._recent_lock:
+                if skip + limit <= len(self._recent):
+                    return list(islice(self._recent, skip, skip + limit))
         
-        # Получаем все файлы логов (основной + архивные)
+        logs = []
         log_files = self._get_log_files()
+        if len(self._indexes) < len(log_files):
+            # Часть файлов еще не проиндексирована (первое чтение после старта)
+            self._prefetch_log_files(log_files)
         
-        # Читаем логи из всех файлов
+        # Файлы идут от нового к старому (основной, .1, .2, ...), строки внутри
+        # файла - от старой к новой, поэтому читаем каждый файл с конца и
+        # пропускаем skip записей без чтения и разбора
         for log_file in log_files:
             try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
+                with open(log_file, 'rb') as f:
+                    starts, lengths = self._get_index(f).lines(service_id)
+                    count = len(starts)
+                    if skip >= count:
+                        skip -= count
+                        continue
+                    
+                    end = count - skip
+                    begin = max(0, end - (limit - len(logs)))
+                    skip = 0
+                    fd = f.fileno()
+                    for i in range(end - 1, begin - 1, -1):
                         try:
-                            log_data = json.loads(line)
-                            log_entry = RequestLogEntry(**log_data)
-                            
-                            # Фильтрация по service_id
-                            if service_id is None or log_entry.mock_service_id == service_id:
-                                logs.append(log_entry)
-                        except (json.JSONDecodeError, TypeError) as e:
+                            log_data = orjson.loads(os.pread(fd, lengths[i], starts[i]))
+                            logs.append(RequestLogEntry(**log_data))
+                        except (ValueError, TypeError):
                             # Пропускаем некорректные строки
                             continue
             except (IOError, OSError):
                 # Пропускаем файлы которые не удается прочитать
                 continue
+            
+            if len(logs) >= limit:
+                break
         
-        # Сортируем по времени (новые сначала)
-        logs.sort(key=lambda x: x.timestamp, reverse=True)
+        return logs
+    
+    def _prefetch_log_files(self, log_files: List[str]):
+        """
+        Запросить у ядра фоновое чтение непроиндексированных частей файлов
         
-        # Применяем пагинацию
-        return logs[skip:skip + limit]
+        Индексы строятся по файлам последовательно; POSIX_FADV_WILLNEED
+        заранее ставит чтение всех файлов в очередь устройства, и к моменту
+        индексации следующего файла его страницы уже в page cache.
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return
+        for log_file in log_files:
+            try:
+                fd = os.open(log_file, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                stat = os.fstat(fd)
+                index = self._indexes.get((stat.st_dev, stat.st_ino))
+                offset = index.size if index is not None and index.size <= stat.st_size else 0
+                if offset < stat.st_size:
+                    os.posix_fadvise(fd, offset, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
     
-    def _get_log_files(self) -> List[str]:
-        """Получение списка всех файлов логов (основной + архивные)"""
-        log_files = []
+    def _get_index(self, f) -> _LogFileIndex:
+        """Актуальный индекс строк открытого файла лога"""
+        stat = os.fstat(f.fileno())
+        key = (stat.st_dev, stat.st_ino)
+        index = self._indexes.get(key)
+        if index is None or stat.st_size < index.size or not index.matches(f.fileno()):
+            # Новый файл, файл был перезаписан или inode достался другому файлу
+            if len(self._indexes) > self.backup_count + 1:
+                self._prune_indexes()
+            index = self._indexes[key] = _LogFileIndex()
+        if stat.st_size > index.size:
+            index.extend(f)
+        return index
+    
+    def _prune_indexes(self):
+        """Удалить индексы файлов, которых уже нет среди файлов логов"""
+        alive = set()
+        for log_file in self._get_log_files():
+            try:
+                stat = os.stat(log_file)
+            except OSError:
+                continue
+            alive.add((stat.st_dev, stat.st_ino))
+        for key in list(self._indexes):
+            if key not in alive:
+                del self._indexes[key]
+    
+    def clear_service_logs(self, service_id: int) -> int:
+        """
+        Удалить из логов записи указанного сервиса
+        
+        Оставшиеся записи в исходном порядке переписываются в основной файл,
+        архивные файлы удаляются.
+        
+        Returns:
+            int: Количество удаленных записей
+        """
+        # Записи из очереди должны попасть в файл до его перезаписи
+        self.flush()
+        
+        remaining = []
+        deleted_count = 0
+        
+        # От старых файлов к новым, чтобы сохранить порядок записей
+        log_files = self._get_log_files()
+        for log_file in reversed(log_files):
+            try:
+                with open(log_file, 'rb') as f:
+                    index = self._get_index(f)
+                    deleted = set(index.lines(service_id)[0])
+                    deleted_count += len(deleted)
+                    f.seek(0)
+                    data = f.read(index.size)
+                    for start, length in zip(index.starts, index.lengths):
+                        if start not in deleted:
+                            remaining.append(data[start:start + length])
+            except (IOError, OSError):
+                continue
         
-        # Основной файл
         main_log_file = os.path.join(self.logs_dir, "requests.log")
-        if os.path.exists(main_log_file):
-            log_files.append(main_log_file)
+        with open(main_log_file, 'wb') as f:
+            f.writelines(remaining)
+        
+        # Удаляем архивные файлы (они больше не актуальны после очистки)
+        for log_file in log_files:
+            if log_file != main_log_file:
+                os.remove(log_file)
+        
+        self._indexes.clear()
+        with self._recent_lock:
+            self._recent = deque(
+                (log_entry for log_entry in self._recent if log_entry.mock_service_id != service_id),
+                maxlen=self._recent.maxlen
+            )
+        return deleted_count
+    
+    def _get_log_files(self) -> List[str]:
+        """
+        Получение списка всех файлов логов (основной + архивные)
         
-        # Архивные файлы (requests.log.1, requests.log.2, ...)
-        for i in range(1, self.backup_count + 1):
-            archive_file = f"{main_log_file}.{i}"
-            if os.path.exists(archive_file):
-                log_files.append(archive_file)
+        Список кэшируется до изменения mtime директории логов (создание,
+        ротация и удаление файлов его меняют).
+        """
+        try:
+            mtime = os.stat(self.logs_dir).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._log_files_cache
+        # Недавно измененной директории не доверяем: на ФС с грубой точностью
+        # mtime следующее изменение в тот же тик не будет заметно
+        if cached is not None and cached[0] == mtime and time.time_ns() - mtime > LOG_FILES_CACHE_SETTLE_NS:
+            return cached[1]
         
+        log_files = self._list_log_files()
+        self._log_files_cache = (mtime, log_files)
         return log_files
     
+    def _list_log_files(self) -> List[str]:
+        """Файлы логов на диске: основной, затем архивные от нового к старому"""
+        return [entry.path for entry in self._scan_log_files()]
+    
+    def _scan_log_files(self) -> List[os.DirEntry]:
+        """
+        Один проход os.scandir по директории логов
+        
+        Возвращает requests.log и архивы requests.log.1 ... requests.log.N
+        (N <= backup_count) в порядке от нового к старому.
+        """
+        files = []
+        try:
+            with os.scandir(self.logs_dir) as entries:
+                for entry in entries:
+                    order = self._log_file_order(entry.name)
+                    if order is not None:
+                        files.append((order, entry))
+        except OSError:
+            return []
+        files.sort(key=lambda item: item[0])
+        return [entry for _, entry in files]
+    
+    def _log_file_order(self, name: str) -> Optional[int]:
+        """Номер файла лога (0 - основной, N - requests.log.N) или None для прочих файлов"""
+        if name == "requests.log":
+            return 0
+        prefix, _, suffix = name.rpartition(".")
+        if prefix == "requests.log" and suffix.isdigit() and 1 <= int(suffix) <= self.backup_count:
+            return int(suffix)
+        return None
+    
     def get_log_files_info(self) -> List[Dict[str, Any]]:
         """Получение информации о файлах логов"""
         files_info = []
         
-        for log_file in self._get_log_files():
+        # Настройки ротации одинаковы для всех файлов
+        max_size_mb = round(self.max_bytes / (1024 * 1024), 2)
+        backup_count = self.backup_count
+        rotation_type = "time" if self.rotation_time else "size"
+        
+        for entry in self._scan_log_files():
             try:
-                stat = os.stat(log_file)
+                stat = entry.stat()
                 files_info.append({
-                    "file": os.path.basename(log_file),
+                    "file": entry.name,
                     "size_bytes": stat.st_size,
                     "size_mb": round(stat.st_size / (1024 * 1024), 2),
                     "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
-                    "backup_count": self.backup_count,
-                    "rotation_type": "time" if self.rotation_time else "size"
+                    "max_size_mb": max_size_mb,
+                    "backup_count": backup_count,
+                    "rotation_type": rotation_type
                 })
             except (IOError, OSError):
                 continue
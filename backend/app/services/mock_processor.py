@@ -1,25 +1,385 @@
+import ast
 import asyncio
+import hashlib
 import httpx
 import json
-from typing import Dict, Any, Tuple, Optional
+import orjson
+import os
+import re
+from typing import AsyncIterator, Dict, Any, Mapping, Tuple, Optional, Union
 from fastapi import Request, Response
-from app.models.mock_service import MockService, ResponseStrategy
+from app.models.mock_service import MockService, ResponseStrategy, LogLevel
 from app.schemas.mock_service import ConditionalResponse
+from app.services.mock_service import route_index
 import time
 import logging
+from collections import OrderedDict
+from functools import lru_cache
+from types import CodeType
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1024)
+def _compile_code(source: str, mode: str) -> CodeType:
+    """
+    Скомпилированный код условий/шаблонов
+    
+    Текст кода хранится в настройках сервиса и повторяется от запроса к запросу,
+    поэтому разбор исходника выполняется один раз. Ошибки компиляции не кэшируются.
+    """
+    if mode == "eval":
+        # eval() со строкой сам отбрасывает ведущие пробелы и табы - сохраняем это поведение
+        source = source.lstrip(" \t")
+    return compile(source, "<string>", mode)
+
+
+# Встроенные функции, доступные коду условий и шаблонам ответов. Общие для
+# всех запросов и не изменяются. Это обычный dict, а не MappingProxyType:
+# CPython требует настоящий словарь в __builtins__ (иначе, например, import
+# завершается SystemError вместо ImportError)
+SAFE_BUILTINS: Dict[str, Any] = {
+    'int': int,
+    'str': str,
+    'float': float,
+    'bool': bool,
+    'len': len,
+    'max': max,
+    'min': min,
+    'sum': sum,
+    'abs': abs,
+    'round': round,
+    'sorted': sorted,
+    'reversed': reversed,
+    'enumerate': enumerate,
+    'zip': zip,
+    'range': range,
+    'list': list,
+    'dict': dict,
+    'set': set,
+    'tuple': tuple,
+    'any': any,
+    'all': all,
+    'True': True,
+    'False': False,
+    'None': None,
+    # Добавляем JSON-совместимые булевы значения
+    'true': True,
+    'false': False,
+    'null': None,
+}
+# Отсутствующее значение в быстрой проверке условия
+_MISSING = object()
+
+
+def _condition_operand(node: ast.AST) -> Optional[Tuple[str, str, Any]]:
+    """Операнд простого условия: (вид, имя, ключ) для name, name[key] и name.get(key)"""
+    if isinstance(node, ast.Name):
+        return 'name', node.id, None
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and isinstance(node.slice, ast.Constant):
+        return 'item', node.value.id, node.slice.value
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'get'
+            and isinstance(node.func.value, ast.Name) and len(node.args) == 1
+            and isinstance(node.args[0], ast.Constant) and not node.keywords):
+        return 'get', node.func.value.id, node.args[0].value
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _simple_condition(condition: str) -> Optional[Tuple[str, str, Any, Any]]:
+    """
+    Разбор условия вида `method == 'POST'`, `query['type'] == 'A'` или
+    `json.get('id') == 1` в (вид, имя, ключ, значение)
+    
+    Такие условия проверяются поиском в контексте без eval. Для остальных
+    условий возвращается None - они выполняются через eval как обычно.
+    """
+    try:
+        node = ast.parse(condition.lstrip(" \t"), mode='eval').body
+    except SyntaxError:
+        return None
+    if not (isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.ops[0], ast.Eq)):
+        return None
+    for operand, literal in ((node.left, node.comparators[0]), (node.comparators[0], node.left)):
+        parsed = _condition_operand(operand)
+        if parsed is None:
+            continue
+        try:
+            value = ast.literal_eval(literal)
+        except (ValueError, TypeError, SyntaxError):
+            continue
+        return (*parsed, value)
+    return None
+
+
+def _match_simple_condition(condition: Tuple[str, str, Any, Any], context: Dict[str, Any],
+                            code_globals: Dict[str, Any]) -> bool:
+    """
+    Проверка простого условия по контексту
+    
+    Имя ищется в том же порядке, что и при eval: контекст, глобальные имена
+    пользовательского кода, встроенные функции. Неизвестное имя, отсутствующий
+    ключ или ошибка сравнения означают, что условие не сработало.
+    """
+    kind, name, key, expected = condition
+    value = context.get(name, _MISSING)
+    if value is _MISSING:
+        value = code_globals.get(name, _MISSING)
+    if value is _MISSING:
+        value = SAFE_BUILTINS.get(name, _MISSING)
+        if value is _MISSING:
+            return False
+    try:
+        if kind == 'item':
+            value = value[key]
+        elif kind == 'get':
+            value = value.get(key)
+        return bool(value == expected)
+    except Exception:
+        return False
+
+
+# Служебные переменные контекста, не передаваемые в параметры proxy_url
+PROXY_EXCLUDED_CONTEXT_VARS = frozenset((
+    'request', 'headers', 'query', 'body', 'method', 'path', 'json',
+    '__builtins__', '__name__', '__doc__', '__package__'
+))
+
+# Служебные переменные контекста условий - не подставляются в шаблон ответа
+TEMPLATE_SERVICE_VARS = frozenset(('request', 'headers', 'query', 'body', 'method', 'path', 'json'))
+# Признаки Python выражения в шаблоне ответа
+TEMPLATE_PYTHON_MARKERS = (' + ', ' - ', ' * ', ' / ', 'str(', 'int(', 'float(')
+
+
+@lru_cache(maxsize=512)
+def _template_traits(template: str) -> Tuple[bool, bool]:
+    """
+    Свойства шаблона ответа, не зависящие от запроса:
+    (есть ли признаки Python выражения, похож ли шаблон на JSON объект)
+    """
+    stripped = template.strip()
+    return (
+        any(op in template for op in TEMPLATE_PYTHON_MARKERS),
+        stripped.startswith('{') and stripped.endswith('}'),
+    )
+
+
+async def _sleep_until(deadline: float):
+    """Подождать до момента deadline по time.monotonic() (если он еще не наступил)"""
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+
+
+def _loads_json(data):
+    """
+    Разбор JSON тела запроса
+    
+    orjson быстрее стандартного json и разбирает байты без промежуточной строки,
+    но не принимает NaN/Infinity и целые больше 64 бит - для таких тел
+    используется json.loads (по тексту, декодированному как тело запроса).
+    """
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='ignore')
+        return json.loads(data)
+
+
+# Заголовки запроса, которые httpx установит сам (имена в ASGI уже в нижнем регистре)
+PROXY_EXCLUDED_REQUEST_HEADERS = frozenset((
+    b'content-length',  # httpx сам вычислит корректную длину
+    b'host',            # httpx сам установит корректный host для целевого URL
+))
+# Заголовки ответа, которые FastAPI должен контролировать сам
+PROXY_EXCLUDED_RESPONSE_HEADERS = frozenset((
+    'content-length',      # FastAPI автоматически вычислит корректную длину
+    'transfer-encoding',   # FastAPI сам управляет кодировкой передачи
+    'connection',          # FastAPI сам управляет соединением
+    'content-encoding',    # httpx уже декодировал сжатый контент, убираем этот заголовок
+))
+
+
+def _proxy_request_headers(request: Request) -> Dict[str, str]:
+    """Заголовки исходного запроса для передачи целевому сервису"""
+    return {
+        key.decode('latin-1'): value.decode('latin-1')
+        for key, value in request.headers.raw
+        if key not in PROXY_EXCLUDED_REQUEST_HEADERS
+    }
+
+
+def _headers_dict(request: Request) -> Dict[str, str]:
+    """
+    Заголовки запроса обычным словарем для кода условий
+    
+    Эквивалент dict(request.headers) (при повторах берется первое значение), но
+    за один проход по сырым заголовкам: Headers.__getitem__ каждый раз
+    просматривает весь список, и dict(request.headers) квадратичен.
+    """
+    headers: Dict[str, str] = {}
+    for key, value in request.headers.raw:
+        name = key.decode('latin-1')
+        if name not in headers:
+            headers[name] = value.decode('latin-1')
+    return headers
+
+
+def _proxy_response_headers(response: httpx.Response) -> Dict[str, str]:
+    """Заголовки ответа целевого сервиса для передачи клиенту"""
+    # httpx отдает имена заголовков в items() уже в нижнем регистре
+    return {
+        key: value
+        for key, value in response.headers.items()
+        if key not in PROXY_EXCLUDED_RESPONSE_HEADERS
+    }
+
+
+# Нетекстовые типы, ответы которых все же передаются и логируются как текст
+TEXTUAL_CONTENT_TYPES = frozenset((
+    'application/javascript',
+    'application/ecmascript',
+    'application/graphql',
+    'application/x-www-form-urlencoded',
+))
+
+
+def _is_textual_content_type(content_type: str) -> bool:
+    """Текстовый ли ответ (без Content-Type ответ считается текстовым, как раньше)"""
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return (
+        not media_type
+        or media_type.startswith('text/')
+        or media_type.endswith(('/json', '+json', '/xml', '+xml'))
+        or media_type in TEXTUAL_CONTENT_TYPES
+    )
+
+
+def binary_body_placeholder(size: int) -> str:
+    """Описание бинарного тела ответа для логов"""
+    return f"<бинарный ответ, {size} байт>"
+
+
+def _proxy_body(response: httpx.Response, content: bytes) -> Tuple[Union[str, bytes], str]:
+    """
+    Тело ответа прокси для клиента и для лога
+    
+    Текстовый ответ декодируется в кодировке ответа (httpx уже снял gzip/deflate).
+    Бинарный (картинки, архивы) передается клиенту байтами как есть, без
+    декодирования в строку, а в лог попадает только его размер.
+    """
+    if _is_textual_content_type(response.headers.get('content-type', '')):
+        text = content.decode(response.encoding or 'utf-8', errors='replace')
+        return text, text
+    return content, binary_body_placeholder(len(content))
+
+
+# Плейсхолдер параметра в proxy_url и шаблоне пути: {id}
+PLACEHOLDER_RE = re.compile(r"\{([^{}]+)\}")
+
+
+@lru_cache(maxsize=1024)
+def _proxy_url_placeholders(proxy_url: str) -> frozenset:
+    """Имена параметров, упомянутых в proxy_url (proxy_url - настройка сервиса, разбирается один раз)"""
+    return frozenset(PLACEHOLDER_RE.findall(proxy_url))
+
+
+def _fill_placeholders(template: str, params: Dict[str, Any]) -> str:
+    """Подставить значения параметров за один проход; неизвестные плейсхолдеры остаются как есть"""
+    return PLACEHOLDER_RE.sub(
+        lambda match: str(params[match.group(1)]) if match.group(1) in params else match.group(0),
+        template
+    )
+
+
+# Максимальное число закэшированных результатов условной стратегии
+CONDITIONAL_CACHE_SIZE = int(os.getenv("CONDITIONAL_CACHE_SIZE", "2048"))
+
+
+def _request_fingerprint(request_data: Dict[str, Any], path_params: Dict[str, str]) -> bytes:
+    """
+    Отпечаток запроса для кэша условной стратегии
+    
+    Учитывает все, что доступно коду условий: метод, путь, параметры пути и
+    запроса, заголовки и тело.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((
+        request_data['method'],
+        request_data['path'],
+        sorted(path_params.items()),
+        sorted(request_data['query_params'].items()),
+        sorted(request_data['headers'].items()),
+    )).encode())
+    digest.update(request_data['body'].encode('utf-8', 'surrogatepass'))
+    return digest.digest()
+
+
+# Ответы прокси больше этого размера передаются клиенту потоком, без буферизации
+PROXY_STREAM_THRESHOLD = int(os.getenv("PROXY_STREAM_THRESHOLD", str(64 * 1024)))
+
+# Таймаут установки соединения с целевым сервисом прокси, секунды
+PROXY_CONNECT_TIMEOUT = float(os.getenv("PROXY_CONNECT_TIMEOUT", "30"))
+
+
+class StreamedBody:
+    """
+    Тело ответа прокси, передаваемое клиенту потоком
+    
+    Содержит уже прочитанное начало ответа и итератор остатка; соединение с
+    целевым сервисом закрывается после передачи (или при обрыве передачи).
+    """
+    
+    def __init__(self, prefix: bytes, chunks: AsyncIterator[bytes], response: httpx.Response):
+        self.prefix = prefix
+        self.chunks = chunks
+        self.response = response
+    
+    async def __aiter__(self):
+        try:
+            yield self.prefix
+            async for chunk in self.chunks:
+                yield chunk
+        finally:
+            await self.response.aclose()
+    
+    def __str__(self) -> str:
+        content_length = self.response.headers.get('content-length')
+        if content_length:
+            return f"<ответ передан потоком, Content-Length: {content_length}>"
+        return "<ответ передан потоком>"
+
+
 class MockProcessor:
     """Процессор для обработки mock запросов"""
     
     def __init__(self):
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+        self.http_client = self._create_http_client()
+        # (id сервиса, отпечаток запроса) -> (истекает, ответ); сбрасывается при
+        # любом изменении сервисов (смене версии индекса маршрутов)
+        self._conditional_cache: OrderedDict = OrderedDict()
+        self._conditional_cache_version = route_index.version
+    
+    @staticmethod
+    def _create_http_client() -> httpx.AsyncClient:
+        """
+        HTTP клиент для проксирования
+        
+        Соединения с целевыми сервисами держатся в пуле keep-alive (HTTP/2 - если
+        сервер его поддерживает), чтобы не платить за TCP/TLS рукопожатие на каждый запрос.
+        """
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=PROXY_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0),
+            http2=True,
+            follow_redirects=True
+        )
     
     async def process_request(self, mock_service: MockService, request: Request, 
-                            body_data = None, path_params: Dict[str, str] = None, body_bytes = None) -> Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]:
+                            body_data = None, path_params: Dict[str, str] = None, body_bytes = None,
+                            collect_proxy_info: Optional[bool] = None) -> Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]:
         """
         Обработка запроса согласно настройкам mock сервиса
         
@@ -29,18 +389,20 @@ class MockProcessor:
             body_data: Тело запроса (строка или байты)
             path_params: Извлеченные параметры из пути
             body_bytes: Оригинальные байты тела запроса (для проксирования в условной стратегии)
+            collect_proxy_info: Собирать ли proxy_info (по умолчанию - только при полном логировании сервиса)
         
         Returns:
             Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]: (status_code, response_body, headers, proxy_info)
         """
         if path_params is None:
             path_params = {}
-            
-        start_time = time.time()
+        if collect_proxy_info is None:
+            # proxy_info нужен только для полного лога запроса
+            collect_proxy_info = mock_service.log_level == LogLevel.FULL
         
         try:
             if mock_service.strategy == ResponseStrategy.PROXY:
-                return await self._process_proxy(mock_service, request, body_data, path_params)
+                return await self._process_proxy(mock_service, request, body_data, path_params, collect_proxy_info)
             elif mock_service.strategy == ResponseStrategy.STATIC:
                 return await self._process_static(mock_service, request)
             elif mock_service.strategy == ResponseStrategy.CONDITIONAL:
@@ -53,7 +415,7 @@ class MockProcessor:
                     body_str = body_data.decode('utf-8', errors='ignore')
                 else:
                     body_str = str(body_data)
-                return await self._process_conditional(mock_service, request, body_str, path_params, body_bytes)
+                return await self._process_conditional(mock_service, request, body_str, path_params, body_bytes, collect_proxy_info)
             else:
                 return 500, "Неизвестная стратегия", {}, None
                 
@@ -62,7 +424,8 @@ class MockProcessor:
             return 500, f"Ошибка сервера: {str(e)}", {}, None
     
     async def _process_proxy(self, mock_service: MockService, request: Request, 
-                           body_data = None, path_params: Dict[str, str] = None) -> Tuple[int, str, Dict[str, str], Dict[str, Any]]:
+                           body_data = None, path_params: Dict[str, str] = None,
+                           collect_proxy_info: bool = True) -> Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]:
         """Обработка proxy стратегии с поддержкой path параметров"""
         if not mock_service.proxy_url:
             return 500, "Не указан proxy_url", {}, None
@@ -71,7 +434,7 @@ class MockProcessor:
         if mock_service.proxy_delay > 0:
             await asyncio.sleep(mock_service.proxy_delay)
         
-        proxy_start_time = time.time()
+        proxy_start_time = time.perf_counter()
         
         try:
             # Правильно обрабатываем тело запроса
@@ -99,114 +462,126 @@ class MockProcessor:
             )
             
             # Подготавливаем заголовки - проксируем ВСЕ заголовки без изменений
-            headers = {}
-            # Исключаем только заголовки, которые httpx установит автоматически
-            excluded_headers = {
-                'content-length',  # httpx сам вычислит корректную длину
-                'host'             # httpx сам установит корректный host для целевого URL
-            }
-            
-            for key, value in request.headers.items():
-                if key.lower() not in excluded_headers:
-                    headers[key] = value
+            headers = _proxy_request_headers(request)
             
             # НЕ модифицируем Host - пусть httpx сам устанавливает корректный
             # НЕ добавляем авторизацию из URL - может конфликтовать с существующей
             
-            logger.info(f"Проксирование: {request.method} {proxy_url}")
-            logger.debug(f"Заголовки отправки: {dict(headers)}")
-            logger.debug(f"Path параметры: {path_params}")
-            logger.debug(f"Размер тела: {len(body)} байт")
-            logger.debug(f"Accept-Encoding в запросе: {headers.get('accept-encoding', 'не задан')}")
-            
-            # Выполняем запрос к внешнему сервису
-            response = await self.http_client.request(
-                method=request.method,
-                url=proxy_url,
-                headers=headers,
-                content=body,
-                follow_redirects=True,
-                timeout=30.0
+            logger.info("Проксирование: %s %s", request.method, proxy_url)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Заголовки отправки: %s", headers)
+                logger.debug("Path параметры: %s", path_params)
+                logger.debug("Размер тела: %s байт", len(body))
+                logger.debug("Accept-Encoding в запросе: %s", headers.get('accept-encoding', 'не задан'))
+            
+            # Выполняем запрос к внешнему сервису; тело ответа читаем сами,
+            # чтобы большие ответы не буферизовать целиком
+            response = await self.http_client.send(
+                self.http_client.build_request(
+                    method=request.method,
+                    url=proxy_url,
+                    headers=headers,
+                    content=body
+                ),
+                stream=True
             )
+            try:
+                content, streamed_body = await self._read_proxy_response(response)
+            except BaseException:
+                await response.aclose()
+                raise
             
-            proxy_time = time.time() - proxy_start_time
+            proxy_time = time.perf_counter() - proxy_start_time
             
             # Подготавливаем заголовки ответа - проксируем ВСЕ заголовки без изменений
-            response_headers = {}
-            # Исключаем только те заголовки, которые FastAPI должен контролировать сам
-            excluded_response_headers = {
-                'content-length',      # FastAPI автоматически вычислит корректную длину
-                'transfer-encoding',   # FastAPI сам управляет кодировкой передачи
-                'connection',          # FastAPI сам управляет соединением
-                'content-encoding'     # httpx уже декодировал сжатый контент, убираем этот заголовок
-            }
-            
-            for key, value in response.headers.items():
-                if key.lower() not in excluded_response_headers:
-                    response_headers[key] = value
-            
-            # Правильно обрабатываем тело ответа
-            try:
-                # httpx автоматически декодирует gzip/deflate, используем .text для текстового контента
-                response_body = response.text
-            except Exception as decode_error:
-                logger.warning(f"Не удалось декодировать ответ как текст: {decode_error}")
-                # Fallback - возвращаем как бинарные данные
-                response_body = response.content.decode('utf-8', errors='ignore')
-            
-            logger.info(f"Ответ от целевого сервера: {response.status_code}")
-            logger.debug(f"Заголовки ответа: {dict(response_headers)}")
-            logger.debug(f"Content-Type: {response.headers.get('content-type', 'не задан')}")
-            logger.debug(f"Исходный Content-Encoding: {response.headers.get('content-encoding', 'нет')}")
+            response_headers = _proxy_response_headers(response)
+            
+            if streamed_body is not None:
+                # Большой ответ передается клиенту потоком, в лог попадает только описание
+                response_body = streamed_body
+                logged_body = str(streamed_body)
+            else:
+                response_body, logged_body = _proxy_body(response, content)
+            
+            logger.info("Ответ от целевого сервера: %s", response.status_code)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Заголовки ответа: %s", response_headers)
+                logger.debug("Content-Type: %s", response.headers.get('content-type', 'не задан'))
+                logger.debug("Исходный Content-Encoding: %s", response.headers.get('content-encoding', 'нет'))
             
             # Собираем информацию о проксировании для логов
-            proxy_info = {
-                "target_url": str(proxy_url),
-                "proxy_headers": dict(headers),
-                "proxy_response_status": response.status_code,
-                "proxy_response_headers": dict(response.headers),
-                "proxy_response_body": response_body,
-                "proxy_time": round(proxy_time, 3),
-                "proxy_error": None
-            }
+            proxy_info = None
+            if collect_proxy_info:
+                proxy_info = {
+                    "target_url": str(proxy_url),
+                    "proxy_headers": headers,
+                    "proxy_response_status": response.status_code,
+                    "proxy_response_headers": dict(response.headers),
+                    "proxy_response_body": logged_body,
+                    "proxy_time": round(proxy_time, 3),
+                    "proxy_error": None
+                }
             
             return response.status_code, response_body, response_headers, proxy_info
             
         except httpx.RequestError as e:
-            proxy_time = time.time() - proxy_start_time
+            proxy_time = time.perf_counter() - proxy_start_time
             error_msg = f"Ошибка соединения с внешним сервисом: {str(e)}"
             
             # Собираем информацию об ошибке проксирования
-            proxy_info = {
-                "target_url": str(proxy_url) if 'proxy_url' in locals() else mock_service.proxy_url,
-                "proxy_headers": dict(headers) if 'headers' in locals() else {},
-                "proxy_response_status": None,
-                "proxy_response_headers": {},
-                "proxy_response_body": "",
-                "proxy_time": round(proxy_time, 3),
-                "proxy_error": str(e)
-            }
+            proxy_info = None
+            if collect_proxy_info:
+                proxy_info = {
+                    "target_url": str(proxy_url) if 'proxy_url' in locals() else mock_service.proxy_url,
+                    "proxy_headers": headers if 'headers' in locals() else {},
+                    "proxy_response_status": None,
+                    "proxy_response_headers": {},
+                    "proxy_response_body": "",
+                    "proxy_time": round(proxy_time, 3),
+                    "proxy_error": str(e)
+                }
             
             logger.error(f"Ошибка proxy запроса: {e}")
             return 502, error_msg, {}, proxy_info
         except Exception as e:
-            proxy_time = time.time() - proxy_start_time
+            proxy_time = time.perf_counter() - proxy_start_time
             error_msg = f"Внутренняя ошибка proxy: {str(e)}"
             
             # Собираем информацию об ошибке проксирования
-            proxy_info = {
-                "target_url": str(proxy_url) if 'proxy_url' in locals() else mock_service.proxy_url,
-                "proxy_headers": dict(headers) if 'headers' in locals() else {},
-                "proxy_response_status": None,
-                "proxy_response_headers": {},
-                "proxy_response_body": "",
-                "proxy_time": round(proxy_time, 3),
-                "proxy_error": str(e)
-            }
+            proxy_info = None
+            if collect_proxy_info:
+                proxy_info = {
+                    "target_url": str(proxy_url) if 'proxy_url' in locals() else mock_service.proxy_url,
+                    "proxy_headers": headers if 'headers' in locals() else {},
+                    "proxy_response_status": None,
+                    "proxy_response_headers": {},
+                    "proxy_response_body": "",
+                    "proxy_time": round(proxy_time, 3),
+                    "proxy_error": str(e)
+                }
             
             logger.error(f"Общая ошибка proxy: {e}")
             return 500, error_msg, {}, proxy_info
     
+    async def _read_proxy_response(self, response: httpx.Response) -> Tuple[bytes, Optional["StreamedBody"]]:
+        """
+        Прочитать начало ответа прокси
+        
+        Ответ до PROXY_STREAM_THRESHOLD байт читается целиком: (content, None).
+        Для большего ответа возвращается (b'', StreamedBody) - уже прочитанное
+        начало и остаток ответа, который будет передан клиенту потоком.
+        """
+        chunks = []
+        size = 0
+        body_iterator = response.aiter_bytes()
+        async for chunk in body_iterator:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > PROXY_STREAM_THRESHOLD:
+                return b'', StreamedBody(b''.join(chunks), body_iterator, response)
+        await response.aclose()
+        return b''.join(chunks), None
+    
     def _build_proxy_url(self, proxy_url: str, mock_path: str, request_path: str, 
                          path_params: Dict[str, str], query_string: str = None) -> str:
         """
@@ -227,18 +602,14 @@ class MockProcessor:
         """
         try:
             # Проверяем, есть ли в proxy_url параметры для подстановки
-            proxy_has_params = any(f"{{{param}}}" in proxy_url for param in path_params.keys())
+            placeholders = _proxy_url_placeholders(proxy_url)
+            proxy_has_params = any(param in path_params for param in placeholders)
             
             if proxy_has_params:
-                # Если в proxy_url есть параметры, подставляем их значения
-                target_url = proxy_url
-                for param_name, param_value in path_params.items():
-                    placeholder = f"{{{param_name}}}"
-                    if placeholder in target_url:
-                        target_url = target_url.replace(placeholder, str(param_value))
-                        logger.debug(f"Подставляем параметр {param_name}={param_value}")
+                # Если в proxy_url есть параметры, подставляем их значения за один проход
+                target_url = _fill_placeholders(proxy_url, path_params)
                 
-                logger.info(f"Проксирование с параметрами: {proxy_url} + {path_params} → {target_url}")
+                logger.info("Проксирование с параметрами: %s + %s → %s", proxy_url, path_params, target_url)
             else:
                 # По умолчанию используем proxy_url как есть, без добавления пути
                 target_url = proxy_url.rstrip('/')
@@ -251,7 +622,7 @@ class MockProcessor:
                     if additional_path:
                         target_url += additional_path
                 
-                logger.info(f"Проксирование без параметров: {proxy_url} → {target_url}")
+                logger.info("Проксирование без параметров: %s → %s", proxy_url, target_url)
             
             # Добавляем query параметры если есть
             if query_string:
@@ -314,11 +685,9 @@ class MockProcessor:
                 return actual_path
             
             # Строим целевой путь, заменяя параметры в шаблоне на их значения
-            target_path = template_path
-            for param_name, param_value in path_params.items():
-                target_path = target_path.replace(f"{{{param_name}}}", param_value)
+            target_path = _fill_placeholders(template_path, path_params)
             
-            logger.info(f"Трансформация пути: {template_path} + {path_params} → {target_path}")
+            logger.info("Трансформация пути: %s + %s → %s", template_path, path_params, target_path)
             return target_path
             
         except Exception as e:
@@ -343,60 +712,51 @@ class MockProcessor:
         )
     
     async def _process_conditional(self, mock_service: MockService, request: Request, 
-                                 body_str: str = None, path_params: Dict[str, str] = None, body_bytes = None) -> Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]:
-        """Обработка условной стратегии с поддержкой path параметров"""
-        logger.info(f"Начинаем обработку условной стратегии для сервиса {mock_service.id}")
+                                 body_str: str = None, path_params: Dict[str, str] = None, body_bytes = None,
+                                 collect_proxy_info: bool = True) -> Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]:
+        """
+        Обработка условной стратегии с поддержкой path параметров
+        
+        Задержка по умолчанию отсчитывается от начала обработки и идет параллельно
+        с выполнением условий: ответ отдается не раньше, чем через conditional_delay
+        (или через delay сработавшего варианта, если она больше).
+        """
+        started = time.monotonic()
+        result = await self._evaluate_conditional(
+            mock_service, request, body_str, path_params, body_bytes, collect_proxy_info, started
+        )
+        await _sleep_until(started + mock_service.conditional_delay)
+        return result
+    
+    async def _evaluate_conditional(self, mock_service: MockService, request: Request, 
+                                  body_str: str, path_params: Optional[Dict[str, str]], body_bytes,
+                                  collect_proxy_info: bool, started: float) -> Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]:
+        """Выбор и формирование ответа условной стратегии (started - начало обработки запроса)"""
+        logger.info("Начинаем обработку условной стратегии для сервиса %s", mock_service.id)
         
         if path_params is None:
             path_params = {}
         
-        # Применяем задержку если задана
-        if mock_service.conditional_delay > 0:
-            await asyncio.sleep(mock_service.conditional_delay)
-        
         # Получаем данные запроса для выполнения условий
         request_data = await self._prepare_request_data(request, body_str)
-        logger.info(f"Данные запроса подготовлены: {request_data}")
-        logger.info(f"Path параметры: {path_params}")
+        logger.info("Данные запроса подготовлены: %s", request_data)
+        logger.info("Path параметры: %s", path_params)
+        
+        cache_key = None
+        cache_ttl = mock_service.conditional_cache_ttl or 0
+        if cache_ttl > 0 and mock_service.condition_code and mock_service.conditional_responses:
+            cache_key = (mock_service.id, _request_fingerprint(request_data, path_params))
+            cached = self._get_cached_conditional(cache_key)
+            if cached is not None:
+                logger.info("Ответ условной стратегии взят из кэша")
+                return cached
         
         # Выполняем условный код если есть
         if mock_service.condition_code and mock_service.conditional_responses:
-            logger.info(f"Код условий: {mock_service.condition_code}")
-            logger.info(f"Количество вариантов ответов: {len(mock_service.conditional_responses) if mock_service.conditional_responses else 0}")
+            logger.info("Код условий: %s", mock_service.condition_code)
+            logger.info("Количество вариантов ответов: %s", len(mock_service.conditional_responses) if mock_service.conditional_responses else 0)
             
             try:
-                # Создаем безопасное окружение для выполнения кода с основными встроенными функциями
-                safe_builtins = {
-                    'int': int,
-                    'str': str,
-                    'float': float,
-                    'bool': bool,
-                    'len': len,
-                    'max': max,
-                    'min': min,
-                    'sum': sum,
-                    'abs': abs,
-                    'round': round,
-                    'sorted': sorted,
-                    'reversed': reversed,
-                    'enumerate': enumerate,
-                    'zip': zip,
-                    'range': range,
-                    'list': list,
-                    'dict': dict,
-                    'set': set,
-                    'tuple': tuple,
-                    'any': any,
-                    'all': all,
-                    'True': True,
-                    'False': False,
-                    'None': None,
-                    # Добавляем JSON-совместимые булевы значения
-                    'true': True,
-                    'false': False,
-                    'null': None,
-                }
-                
                 context = {
                     'request': request_data,
                     'headers': request_data.get('headers', {}),
@@ -408,26 +768,28 @@ class MockProcessor:
                     'json': None
                 }
                 
-                logger.info(f"Контекст создан: query={context['query']}, method={context['method']}, path={context['path']}, path_params={context['path_params']}")
+                logger.info("Контекст создан: query=%s, method=%s, path=%s, path_params=%s", context['query'], context['method'], context['path'], context['path_params'])
                 
                 # Пытаемся распарсить JSON из body
                 try:
                     if request_data.get('body'):
-                        context['json'] = json.loads(request_data['body'])
-                        logger.info(f"JSON распарсен: {context['json']}")
+                        context['json'] = _loads_json(body_bytes if body_bytes else request_data['body'])
+                        logger.info("JSON распарсен: %s", context['json'])
                 except Exception as e:
-                    logger.info(f"Не удалось распарсить JSON: {e}")
+                    logger.info("Не удалось распарсить JSON: %s", e)
                     pass
                 
                 # Выполняем код условий с безопасными встроенными функциями
                 logger.info("Выполняем код условий...")
-                exec(mock_service.condition_code, {"__builtins__": safe_builtins}, context)
-                logger.info(f"Код условий выполнен успешно. Обновленный контекст: {list(context.keys())}")
+                # Глобальное окружение одно на запрос: код условий и все условия выполняются в нем
+                code_globals = {"__builtins__": SAFE_BUILTINS}
+                exec(_compile_code(mock_service.condition_code, 'exec'), code_globals, context)
+                logger.info("Код условий выполнен успешно. Обновленный контекст: %s", context.keys())
                 
                 # Ищем подходящий ответ
                 logger.info("Проверяем варианты ответов...")
                 for i, resp_data in enumerate(mock_service.conditional_responses):
-                    logger.info(f"Проверяем вариант {i}: {resp_data}")
+                    logger.info("Проверяем вариант %s: %s", i, resp_data)
                     
                     # Проверяем что resp_data не None
                     if resp_data is None:
@@ -440,15 +802,20 @@ class MockProcessor:
                             logger.error(f"Условие в варианте {i} равно None!")
                             continue
                             
-                        logger.info(f"Выполняем условие: {condition_text}")
-                        condition_result = eval(condition_text, {"__builtins__": safe_builtins}, context)
-                        logger.info(f"Результат условия '{condition_text}': {condition_result}")
+                        logger.info("Выполняем условие: %s", condition_text)
+                        simple_condition = _simple_condition(condition_text)
+                        if simple_condition is not None:
+                            # Простое сравнение - проверяем без eval
+                            condition_result = _match_simple_condition(simple_condition, context, code_globals)
+                        else:
+                            condition_result = eval(_compile_code(condition_text, 'eval'), code_globals, context)
+                        logger.info("Результат условия '%s': %s", condition_text, condition_result)
                         
                         if condition_result:
-                            logger.info(f"Условие {i} сработало! Возвращаем ответ.")
-                            # Применяем задержку если задана для этого ответа
-                            if resp_data.get('delay', 0) > 0:
-                                await asyncio.sleep(resp_data['delay'])
+                            logger.info("Условие %s сработало! Возвращаем ответ.", i)
+                            # Выдерживаем задержку варианта (или задержку по умолчанию, если она больше),
+                            # отсчитывая от начала обработки запроса
+                            await _sleep_until(started + max(mock_service.conditional_delay, resp_data.get('delay', 0)))
                             
                             # Безопасно получаем заголовки - если None, то пустой словарь
                             headers = resp_data.get('headers') or {}
@@ -460,7 +827,7 @@ class MockProcessor:
                                 # Проксируем запрос
                                 proxy_url = resp_data.get('proxy_url')
                                 if proxy_url:
-                                    logger.info(f"Проксируем запрос на {proxy_url}")
+                                    logger.info("Проксируем запрос на %s", proxy_url)
                                     
                                     # Подготавливаем расширенные параметры для подстановки
                                     # Объединяем path_params с переменными из контекста выполнения
@@ -468,21 +835,17 @@ class MockProcessor:
                                     
                                     # Добавляем переменные из контекста выполнения Python скрипта
                                     # Исключаем служебные переменные
-                                    excluded_vars = {
-                                        'request', 'headers', 'query', 'body', 'method', 'path', 'json',
-                                        '__builtins__', '__name__', '__doc__', '__package__'
-                                    }
                                     
                                     for var_name, var_value in context.items():
-                                        if var_name not in excluded_vars and not var_name.startswith('_'):
+                                        if var_name not in PROXY_EXCLUDED_CONTEXT_VARS and not var_name.startswith('_'):
                                             # Преобразуем значение в строку для подстановки
                                             if var_value is not None:
                                                 extended_params[var_name] = str(var_value)
                                     
-                                    logger.info(f"Расширенные параметры для подстановки: {extended_params}")
+                                    logger.info("Расширенные параметры для подстановки: %s", extended_params)
                                     
                                     return await self._proxy_conditional_request(
-                                        proxy_url, request, body_bytes, extended_params
+                                        proxy_url, request, body_bytes, extended_params, collect_proxy_info
                                     )
                                 else:
                                     logger.error("Не указан proxy_url для проксирования")
@@ -492,15 +855,19 @@ class MockProcessor:
                                 response_body = self._process_response_template(
                                     resp_data.get('response', ''), 
                                     context, 
-                                    safe_builtins
+                                    SAFE_BUILTINS
                                 )
                                 
-                                return (
+                                result = (
                                     resp_data.get('status_code', 200),
                                     response_body,
                                     headers,
                                     None  # Нет информации о проксировании для статических ответов
                                 )
+                                # Кэшируем только статические ответы без собственной задержки
+                                if cache_key is not None and not resp_data.get('delay', 0):
+                                    self._set_cached_conditional(cache_key, result, cache_ttl)
+                                return result
                     except Exception as e:
                         logger.error(f"Ошибка при выполнении условия '{resp_data.get('condition') if resp_data else 'None'}': {e}")
                         continue
@@ -527,7 +894,30 @@ class MockProcessor:
             None  # Нет информации о проксировании для дефолтного ответа
         )
     
-    def _process_response_template(self, response_template: str, context: Dict[str, Any], safe_builtins: Dict[str, Any]) -> str:
+    def _get_cached_conditional(self, key) -> Optional[Tuple[int, str, Dict[str, str], None]]:
+        """Закэшированный ответ условной стратегии (None - нет в кэше или истек)"""
+        if self._conditional_cache_version != route_index.version:
+            self._conditional_cache.clear()
+            self._conditional_cache_version = route_index.version
+            return None
+        entry = self._conditional_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._conditional_cache[key]
+            return None
+        self._conditional_cache.move_to_end(key)
+        return result
+    
+    def _set_cached_conditional(self, key, result: Tuple[int, str, Dict[str, str], None], ttl: float):
+        """Сохранить ответ условной стратегии, вытесняя самые давно использованные"""
+        self._conditional_cache[key] = (time.monotonic() + ttl, result)
+        self._conditional_cache.move_to_end(key)
+        while len(self._conditional_cache) > CONDITIONAL_CACHE_SIZE:
+            self._conditional_cache.popitem(last=False)
+    
+    def _process_response_template(self, response_template: str, context: Dict[str, Any], safe_builtins: Mapping[str, Any]) -> str:
         """
         Обрабатывает шаблон ответа, выполняя Python код если нужно
         
@@ -542,25 +932,24 @@ class MockProcessor:
         try:
             # Проверяем, содержит ли ответ Python выражения
             # Простая эвристика: если содержит переменные из контекста или операторы Python
-            contains_python = any([
-                var in response_template for var in context.keys()
-                if var not in ['request', 'headers', 'query', 'body', 'method', 'path', 'json']
-            ]) or any([
-                op in response_template for op in [' + ', ' - ', ' * ', ' / ', 'str(', 'int(', 'float(']
-            ])
+            has_markers, is_json_like = _template_traits(response_template)
+            contains_python = has_markers or any(
+                var in response_template for var in context
+                if var not in TEMPLATE_SERVICE_VARS
+            )
             
             if contains_python:
-                logger.info(f"Обнаружен Python код в ответе, выполняем: {response_template}")
+                logger.info("Обнаружен Python код в ответе, выполняем: %s", response_template)
                 
                 # Создаем локальную копию контекста для безопасности
                 local_context = context.copy()
                 
                 # Проверяем, является ли ответ JSON-подобным
-                if response_template.strip().startswith('{') and response_template.strip().endswith('}'):
+                if is_json_like:
                     # Для JSON используем специальную обработку
                     try:
                         # Выполняем как Python словарь
-                        result_dict = eval(response_template, {"__builtins__": safe_builtins}, local_context)
+                        result_dict = eval(_compile_code(response_template, 'eval'), {"__builtins__": safe_builtins}, local_context)
                         # Конвертируем обратно в JSON
                         result = json.dumps(result_dict, ensure_ascii=False)
                     except Exception as json_error:
@@ -568,15 +957,15 @@ class MockProcessor:
                         # Fallback: пытаемся заменить переменные напрямую
                         result = response_template
                         for var_name, var_value in local_context.items():
-                            if var_name not in ['request', 'headers', 'query', 'body', 'method', 'path', 'json']:
+                            if var_name not in TEMPLATE_SERVICE_VARS:
                                 result = result.replace(str(var_name), str(var_value))
                 else:
                     # Для не-JSON ответов используем eval напрямую
-                    result = eval(response_template, {"__builtins__": safe_builtins}, local_context)
+                    result = eval(_compile_code(response_template, 'eval'), {"__builtins__": safe_builtins}, local_context)
                     if not isinstance(result, str):
                         result = str(result)
                 
-                logger.info(f"Результат выполнения шаблона: {result}")
+                logger.info("Результат выполнения шаблона: %s", result)
                 return result
             else:
                 # Если нет Python кода, возвращаем как есть
@@ -600,13 +989,14 @@ class MockProcessor:
             'method': request.method,
             'path': request.url.path,
             'query_params': dict(request.query_params),
-            'headers': dict(request.headers),
+            'headers': _headers_dict(request),
             'body': body,
             'url': str(request.url)
         }
     
     async def _proxy_conditional_request(self, proxy_url: str, request: Request, 
-                                       body_data = None, path_params: Dict[str, str] = None) -> Tuple[int, str, Dict[str, str], Dict[str, Any]]:
+                                       body_data = None, path_params: Dict[str, str] = None,
+                                       collect_proxy_info: bool = True) -> Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]:
         """
         Проксирование запроса в условном ответе
         
@@ -615,25 +1005,16 @@ class MockProcessor:
             request: Исходный запрос
             body_data: Тело запроса
             path_params: Path параметры для подстановки
+            collect_proxy_info: Собирать ли информацию о проксировании для лога
             
         Returns:
-            Tuple[int, str, Dict[str, str], Dict[str, Any]]: (status_code, response_body, headers, proxy_info)
+            Tuple[int, str, Dict[str, str], Optional[Dict[str, Any]]]: (status_code, response_body, headers, proxy_info)
         """
-        proxy_start_time = time.time()
+        proxy_start_time = time.perf_counter()
         
         try:
             # Подготавливаем заголовки для проксирования - копируем ВСЕ заголовки из исходного запроса
-            proxy_headers = {}
-            
-            # Исключаем только заголовки, которые httpx установит автоматически
-            excluded_headers = {
-                'content-length',  # httpx сам вычислит корректную длину
-                'host'             # httpx сам установит корректный host для целевого URL
-            }
-            
-            for key, value in request.headers.items():
-                if key.lower() not in excluded_headers:
-                    proxy_headers[key] = value
+            proxy_headers = _proxy_request_headers(request)
             
             # Подготавливаем URL для проксирования с подстановкой параметров
             # Используем тот же метод что и для обычного проксирования
@@ -648,10 +1029,10 @@ class MockProcessor:
                 request.url.query
             )
             
-            logger.info(f"Проксируем условный запрос: {request.method} {target_url}")
-            logger.debug(f"Исходный proxy_url: {proxy_url}")
-            logger.debug(f"Path параметры: {path_params}")
-            logger.debug(f"Заголовки для проксирования: {proxy_headers}")
+            logger.info("Проксируем условный запрос: %s %s", request.method, target_url)
+            logger.debug("Исходный proxy_url: %s", proxy_url)
+            logger.debug("Path параметры: %s", path_params)
+            logger.debug("Заголовки для проксирования: %s", proxy_headers)
             
             # Подготавливаем тело запроса
             if body_data is not None:
@@ -665,53 +1046,50 @@ class MockProcessor:
                 # Читаем сырые байты без декодирования
                 content = await request.body()
             
-            # Выполняем проксирование
-            proxy_response = await self.http_client.request(
-                method=request.method,
-                url=target_url,
-                headers=proxy_headers,
-                content=content,
-                follow_redirects=True,
-                timeout=30.0
+            # Выполняем проксирование; большие ответы, как и в proxy стратегии,
+            # передаются клиенту потоком без буферизации
+            proxy_response = await self.http_client.send(
+                self.http_client.build_request(
+                    method=request.method,
+                    url=target_url,
+                    headers=proxy_headers,
+                    content=content
+                ),
+                stream=True
             )
+            try:
+                response_bytes, streamed_body = await self._read_proxy_response(proxy_response)
+            except BaseException:
+                await proxy_response.aclose()
+                raise
             
-            proxy_time = time.time() - proxy_start_time
+            proxy_time = time.perf_counter() - proxy_start_time
             
             # Обрабатываем ответ аналогично обычному проксированию
-            try:
-                # httpx автоматически декодирует gzip/deflate, используем .text
-                response_content = proxy_response.text
-            except Exception as decode_error:
-                logger.warning(f"Не удалось декодировать условный ответ как текст: {decode_error}")
-                response_content = proxy_response.content.decode('utf-8', errors='ignore')
+            if streamed_body is not None:
+                response_content = streamed_body
+                logged_body = str(streamed_body)
+            else:
+                response_content, logged_body = _proxy_body(proxy_response, response_bytes)
             
             # Подготавливаем заголовки ответа - проксируем ВСЕ заголовки без изменений
-            response_headers = {}
-            # Исключаем только те заголовки, которые FastAPI должен контролировать сам
-            excluded_response_headers = {
-                'content-length',      # FastAPI автоматически вычислит корректную длину
-                'transfer-encoding',   # FastAPI сам управляет кодировкой передачи
-                'connection',          # FastAPI сам управляет соединением
-                'content-encoding'     # httpx уже декодировал сжатый контент, убираем этот заголовок
-            }
-            
-            for key, value in proxy_response.headers.items():
-                if key.lower() not in excluded_response_headers:
-                    response_headers[key] = value
-            
-            logger.info(f"Условное проксирование выполнено: {proxy_response.status_code}")
-            logger.debug(f"Исходный Content-Encoding: {proxy_response.headers.get('content-encoding', 'нет')}")
+            response_headers = _proxy_response_headers(proxy_response)
+            
+            logger.info("Условное проксирование выполнено: %s", proxy_response.status_code)
+            logger.debug("Исходный Content-Encoding: %s", proxy_response.headers.get('content-encoding', 'нет'))
             
             # Собираем информацию о проксировании для логов
-            proxy_info = {
-                "target_url": str(target_url),
-                "proxy_headers": dict(proxy_headers),
-                "proxy_response_status": proxy_response.status_code,
-                "proxy_response_headers": dict(proxy_response.headers),
-                "proxy_response_body": response_content,
-                "proxy_time": round(proxy_time, 3),
-                "proxy_error": None
-            }
+            proxy_info = None
+            if collect_proxy_info:
+                proxy_info = {
+                    "target_url": str(target_url),
+                    "proxy_headers": proxy_headers,
+                    "proxy_response_status": proxy_response.status_code,
+                    "proxy_response_headers": dict(proxy_response.headers),
+                    "proxy_response_body": logged_body,
+                    "proxy_time": round(proxy_time, 3),
+                    "proxy_error": None
+                }
             
             return (
                 proxy_response.status_code,
@@ -721,23 +1099,31 @@ class MockProcessor:
             )
             
         except Exception as e:
-            proxy_time = time.time() - proxy_start_time
+            proxy_time = time.perf_counter() - proxy_start_time
             error_msg = f"Ошибка проксирования: {str(e)}"
             
             # Собираем информацию об ошибке проксирования
-            proxy_info = {
-                "target_url": str(target_url) if 'target_url' in locals() else proxy_url,
-                "proxy_headers": dict(proxy_headers) if 'proxy_headers' in locals() else {},
-                "proxy_response_status": None,
-                "proxy_response_headers": {},
-                "proxy_response_body": "",
-                "proxy_time": round(proxy_time, 3),
-                "proxy_error": str(e)
-            }
+            proxy_info = None
+            if collect_proxy_info:
+                proxy_info = {
+                    "target_url": str(target_url) if 'target_url' in locals() else proxy_url,
+                    "proxy_headers": proxy_headers if 'proxy_headers' in locals() else {},
+                    "proxy_response_status": None,
+                    "proxy_response_headers": {},
+                    "proxy_response_body": "",
+                    "proxy_time": round(proxy_time, 3),
+                    "proxy_error": str(e)
+                }
             
             logger.error(f"Ошибка при условном проксировании на {proxy_url}: {e}")
             return 500, error_msg, {}, proxy_info
 
     async def close(self):
-        """Закрытие HTTP клиента"""
-        await self.http_client.aclose() 
\ No newline at end of file
+        """
+        Закрытие HTTP клиента
+        
+        Процессор - модульный синглтон и живет дольше одного цикла lifespan
+        приложения, поэтому вместо закрытого клиента сразу создается новый.
+        """
+        await self.http_client.aclose()
+        self.http_client = self._create_http_client() 
\ No newline at end of file
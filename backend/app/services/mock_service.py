@@ -3,11 +3,81 @@ from sqlalchemy import select, delete, update
 from sqlalchemy.orm import selectinload
 from typing import List, Optional, Dict, Tuple
 import re
+import logging
+from functools import lru_cache
 from app.models.mock_service import MockService, ServiceType
 from app.schemas.mock_service import MockServiceCreate, MockServiceUpdate
 from app.utils.path_parser import path_parser
 from app.utils.soap_parser import SOAPParser
 
+logger = logging.getLogger(__name__)
+
+
+# Признак еще не определенного SOAP метода запроса
+_NOT_PARSED = object()
+
+# Разделители частей в именах SOAP сервисов и методов
+SOAP_NAME_SPLIT_RE = re.compile(r'[._-]')
+
+
+@lru_cache(maxsize=1024)
+def _soap_name_tokens(name: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Имя в нижнем регистре и его значимые части (длиннее двух символов)
+    
+    Имена сервисов и методов повторяются от запроса к запросу, поэтому
+    разбираются один раз.
+    """
+    name_lower = name.lower().strip()
+    parts = tuple(part for part in SOAP_NAME_SPLIT_RE.split(name_lower) if len(part) > 2)
+    return name_lower, parts
+
+
+class RouteIndex:
+    """
+    Индекс активных mock сервисов в памяти процесса
+    
+    Хранит для каждого HTTP метода список скомпилированных шаблонов путей
+    в порядке выборки из БД. Перестраивается одним запросом к БД после
+    invalidate() (вызывается при создании, изменении и удалении сервисов).
+    """
+    
+    def __init__(self):
+        self.version = 0
+        self._built_version = -1
+        self._routes: Dict[str, List[Tuple["re.Pattern", bool, MockService]]] = {}
+    
+    def invalidate(self):
+        """Пометить индекс устаревшим"""
+        self.version += 1
+    
+    async def get_routes(self, db: AsyncSession, method: str) -> List[Tuple["re.Pattern", bool, MockService]]:
+        """Получить маршруты для метода, перестроив индекс при необходимости"""
+        if self._built_version != self.version:
+            await self._rebuild(db)
+        return self._routes.get(method.upper(), [])
+    
+    async def _rebuild(self, db: AsyncSession):
+        version = self.version
+        result = await db.execute(
+            select(MockService).where(MockService.is_active == True)
+        )
+        services = result.scalars().all()
+        
+        routes: Dict[str, List[Tuple["re.Pattern", bool, MockService]]] = {}
+        for service in services:
+            # Отвязываем объект от сессии запроса - он переживет ее
+            db.expunge(service)
+            pattern, is_wildcard = path_parser.compile_pattern(service.path)
+            for service_method in {m.upper() for m in service.methods}:
+                routes.setdefault(service_method, []).append((pattern, is_wildcard, service))
+        
+        self._routes = routes
+        self._built_version = version
+
+
+route_index = RouteIndex()
+
 
 class MockServiceService:
     def __init__(self, db: AsyncSession):
@@ -20,7 +90,18 @@ class MockServiceService:
         if not is_valid:
             raise ValueError(f"Некорректный шаблон пути: {error_message}")
         
-        mock_service = MockService(
+        mock_service = self._build_model(mock_data)
+        
+        self.db.add(mock_service)
+        await self.db.commit()
+        await self.db.refresh(mock_service)
+        route_index.invalidate()
+        return mock_service
+
+    @staticmethod
+    def _build_model(mock_data: MockServiceCreate) -> MockService:
+        """Собрать ORM-объект из схемы создания"""
+        return MockService(
             name=mock_data.name,
             path=mock_data.path,
             methods=mock_data.methods,
@@ -33,17 +114,40 @@ class MockServiceService:
             static_headers=mock_data.static_headers,
             static_delay=mock_data.static_delay,
             condition_code=mock_data.condition_code,
-            conditional_responses=[resp.dict() for resp in mock_data.conditional_responses] if mock_data.conditional_responses else None,
+            conditional_responses=[resp.model_dump() for resp in mock_data.conditional_responses] if mock_data.conditional_responses else None,
             conditional_delay=mock_data.conditional_delay,
             conditional_status_code=mock_data.conditional_status_code,
             conditional_headers=mock_data.conditional_headers,
-            is_active=mock_data.is_active
+            conditional_cache_ttl=mock_data.conditional_cache_ttl,
+            is_active=mock_data.is_active,
+            log_level=mock_data.log_level
         )
+
+    async def bulk_create_mock_services(self, items: List[MockServiceCreate],
+                                        rejected: Optional[List[Tuple[int, str]]] = None) -> List[MockService]:
+        """Создать несколько mock сервисов одной транзакцией.
+
+        Элементы с некорректным шаблоном пути пропускаются, остальные
+        вставляются одним INSERT и одним commit. Если передан список rejected,
+        в него добавляются (индекс элемента в items, описание ошибки) пропущенных.
+        """
+        mock_services = []
+        for index, mock_data in enumerate(items):
+            is_valid, error_message = path_parser.validate_path_pattern(mock_data.path)
+            if not is_valid:
+                logger.warning(f"Пропуск сервиса {mock_data.name}: некорректный шаблон пути: {error_message}")
+                if rejected is not None:
+                    rejected.append((index, f"Некорректный шаблон пути: {error_message}"))
+                continue
+            mock_services.append(self._build_model(mock_data))
         
-        self.db.add(mock_service)
+        if not mock_services:
+            return []
+        
+        self.db.add_all(mock_services)
         await self.db.commit()
-        await self.db.refresh(mock_service)
-        return mock_service
+        route_index.invalidate()
+        return mock_services
 
     async def get_mock_service(self, service_id: int) -> Optional[MockService]:
         """Получить mock сервис по ID"""
@@ -66,42 +170,40 @@ class MockServiceService:
         )
         return result.scalars().all()
 
-    async def find_mock_service_by_path_and_method(self, path: str, method: str, body: str = None, headers: Dict[str, str] = None) -> Tuple[Optional[MockService], Dict[str, str]]:
+    async def find_mock_service_by_path_and_method(self, path: str, method: str, body: bytes = None, headers: Dict[str, str] = None) -> Tuple[Optional[MockService], Dict[str, str]]:
         """
         Найти mock сервис по пути и методу с поддержкой параметризованных путей и SOAP методов
         
         Args:
             path: Путь запроса
             method: HTTP метод
-            body: Тело запроса (для SOAP)
-            headers: HTTP заголовки (для SOAP)
+            body: Сырое тело запроса (для SOAP, декодируется только при необходимости)
+            headers: HTTP заголовки, нужные для SOAP (SOAPAction, Content-Type)
             
         Returns:
             Tuple[Optional[MockService], Dict[str, str]]: (сервис, извлеченные параметры)
         """
-        result = await self.db.execute(
-            select(MockService).where(MockService.is_active == True)
-        )
-        services = result.scalars().all()
+        routes = await route_index.get_routes(self.db, method)
         
         # Переменные для fallback варианта (SOAP сервисы без определенного метода)
         fallback_service = None
         fallback_params = {}
+        # SOAP метод запроса определяется один раз, при первом подходящем SOAP сервисе
+        soap_method = _NOT_PARSED
         
-        # Ищем сервис, который поддерживает данный метод и путь
-        for service in services:
-            # Проверяем метод
-            if method.upper() not in [m.upper() for m in service.methods]:
-                continue
-            
+        # Ищем сервис, который поддерживает данный путь (метод уже отобран индексом)
+        for pattern, is_wildcard, service in routes:
             # Проверяем путь с поддержкой параметров
-            path_params = path_parser.extract_parameters(service.path, path)
-            if path_params is None:
+            match = pattern.match(path)
+            if match is None:
                 continue
+            path_params = {"*": match.group(1)} if is_wildcard else match.groupdict()
             
             # Для SOAP сервисов дополнительно проверяем метод в заголовках HTTP
-            if service.service_type == ServiceType.SOAP and headers:
-                soap_method = SOAPParser.extract_soap_method(headers, body)
+            if service.service_type == ServiceType.SOAP and headers is not None:
+                if soap_method is _NOT_PARSED:
+                    body_str = body.decode('utf-8', errors='ignore') if body else ''
+                    soap_method = SOAPParser.extract_soap_method(headers, body_str)
                 if soap_method:
                     # Проверяем соответствие SOAP метода с именем сервиса (улучшенная логика)
                     if self._matches_soap_service(service.name, soap_method):
@@ -142,52 +244,24 @@ class MockServiceService:
         if not service_name or not soap_method:
             return False
         
-        service_name_lower = service_name.lower().strip()
-        soap_method_lower = soap_method.lower().strip()
+        service_name_lower, service_parts = _soap_name_tokens(service_name)
+        soap_method_lower, soap_parts = _soap_name_tokens(soap_method)
         
-        # Простое вхождение метода в имя сервиса
+        # Вхождение метода в имя сервиса. Покрывает и паттерны именования
+        # ServiceName_MethodName, MethodName_ServiceName, ServiceName.MethodName,
+        # MethodName.ServiceName и ServiceNameMethodName
         if soap_method_lower in service_name_lower:
             return True
         
-        # Проверяем паттерны именования:
-        # 1. ServiceName_MethodName
-        if service_name_lower.endswith(f"_{soap_method_lower}"):
-            return True
-        
-        # 2. MethodName_ServiceName  
-        if service_name_lower.startswith(f"{soap_method_lower}_"):
-            return True
-        
-        # 3. ServiceName.MethodName (с точкой)
-        if service_name_lower.endswith(f".{soap_method_lower}"):
-            return True
-        
-        # 4. MethodName.ServiceName
-        if service_name_lower.startswith(f"{soap_method_lower}."):
-            return True
-        
-        # 5. ServiceNameMethodName (без разделителей)
-        if service_name_lower.endswith(soap_method_lower):
-            return True
-        
-        if service_name_lower.startswith(soap_method_lower):
-            return True
-        
-        # 6. Обратная проверка - имя сервиса содержится в методе
+        # Обратная проверка - имя сервиса содержится в методе
         if service_name_lower in soap_method_lower:
             return True
         
-        # 7. Проверяем части имени (разделенные по _ или .)
-        service_parts = re.split(r'[._-]', service_name_lower)
-        soap_parts = re.split(r'[._-]', soap_method_lower)
-        
-        # Ищем пересечения в частях
+        # Проверяем части имени (разделенные по _, . или -)
         for service_part in service_parts:
-            if service_part and len(service_part) > 2:  # Игнорируем слишком короткие части
-                for soap_part in soap_parts:
-                    if soap_part and len(soap_part) > 2:
-                        if service_part == soap_part or service_part in soap_part or soap_part in service_part:
-                            return True
+            for soap_part in soap_parts:
+                if service_part in soap_part or soap_part in service_part:
+                    return True
         
         return False
 
@@ -200,7 +274,7 @@ class MockServiceService:
 
         # Обновляем только переданные поля
         update_data = {}
-        for field, value in mock_data.dict(exclude_unset=True).items():
+        for field, value in mock_data.model_dump(exclude_unset=True).items():
             # Валидируем путь если он изменяется
             if field == 'path' and value is not None:
                 is_valid, error_message = path_parser.validate_path_pattern(value)
@@ -211,9 +285,9 @@ class MockServiceService:
                 # Проверяем тип данных - если это уже список словарей, оставляем как есть
                 # Если это список Pydantic объектов, конвертируем в словари
                 if isinstance(value, list) and len(value) > 0:
-                    if hasattr(value[0], 'dict'):
+                    if hasattr(value[0], 'model_dump'):
                         # Это Pydantic объекты
-                        update_data[field] = [resp.dict() for resp in value]
+                        update_data[field] = [resp.model_dump() for resp in value]
                     else:
                         # Это уже словари
                         update_data[field] = value
@@ -229,6 +303,7 @@ class MockServiceService:
                 .values(**update_data)
             )
             await self.db.commit()
+            route_index.invalidate()
             
             # Получаем обновленный объект
             await self.db.refresh(mock_service)
@@ -241,6 +316,7 @@ class MockServiceService:
             delete(MockService).where(MockService.id == service_id)
         )
         await self.db.commit()
+        route_index.invalidate()
         return result.rowcount > 0
 
     def get_path_parameters(self, path_pattern: str) -> List[str]:
@@ -417,4 +417,36 @@ class SwaggerService:
             "message": "Успешный ответ",
             "data": {},
             "timestamp": "2024-01-01T00:00:00Z"
-        }, indent=2, ensure_ascii=False) 
\ No newline at end of file
+        }, indent=2, ensure_ascii=False) 
+
+# Функции для выполнения в процессах пула (см. app.api.swagger).
+# Экземпляр Faker дорого передавать между процессами, поэтому
+# каждый рабочий процесс создает собственный SwaggerService.
+_worker_service: Optional[SwaggerService] = None
+
+
+def _get_worker_service() -> SwaggerService:
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = SwaggerService()
+    return _worker_service
+
+
+# Исключения из рабочего процесса передаются в родительский через pickle, а
+# часть из них (например, pydantic ValidationError) не восстанавливается и
+# ломает весь пул, поэтому наружу отдается ValueError с исходным текстом.
+
+def parse_swagger_content_task(content: str, content_type: str = 'json') -> SwaggerImportResult:
+    """Парсинг Swagger контента в рабочем процессе"""
+    try:
+        return _get_worker_service().parse_swagger_content(content, content_type)
+    except Exception as e:
+        raise ValueError(str(e)) from None
+
+
+def generate_mock_services_task(swagger_result: SwaggerImportResult, base_path: str = "/api") -> List[MockServiceCreate]:
+    """Генерация mock сервисов в рабочем процессе"""
+    try:
+        return _get_worker_service().generate_mock_services(swagger_result, base_path)
+    except Exception as e:
+        raise ValueError(str(e)) from None
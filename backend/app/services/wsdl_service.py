@@ -1,12 +1,96 @@
-import xml.etree.ElementTree as ET
+from lxml import etree as ET
 import httpx
 import re
 from typing import Dict, List, Optional, Any, Tuple
 from urllib.parse import urljoin, urlparse
+from collections import OrderedDict
 import logging
+import time
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# Размер куска при потоковой загрузке WSDL
+WSDL_CHUNK_SIZE = 32 * 1024
+
+
+@lru_cache(maxsize=1024)
+def _sample_value(name: str, type_name: str) -> str:
+    """Примерное значение элемента по имени и типу (кэшируется: в WSDL типы повторяются)"""
+    
+    element_type = type_name.lower()
+    element_name = name.lower()
+    
+    # Специфичные имена полей
+    if any(keyword in element_name for keyword in ['id', 'identifier']):
+        return "12345"
+    elif any(keyword in element_name for keyword in ['name', 'title', 'label']):
+        return f"Example {name}"
+    elif any(keyword in element_name for keyword in ['email', 'mail']):
+        return "example@domain.com"
+    elif any(keyword in element_name for keyword in ['phone', 'tel']):
+        return "+1234567890"
+    elif any(keyword in element_name for keyword in ['url', 'link']):
+        return "https://example.com"
+    elif any(keyword in element_name for keyword in ['address', 'location']):
+        return "123 Main Street, City, Country"
+    elif any(keyword in element_name for keyword in ['price', 'cost', 'amount']):
+        return "99.99"
+    elif any(keyword in element_name for keyword in ['count', 'quantity', 'number']):
+        return "10"
+    elif any(keyword in element_name for keyword in ['status', 'state']):
+        return "active"
+    elif any(keyword in element_name for keyword in ['description', 'comment', 'note']):
+        return f"Description for {name}"
+    elif any(keyword in element_name for keyword in ['code', 'key']):
+        return f"CODE_{name.upper()}"
+    elif any(keyword in element_name for keyword in ['version']):
+        return "1.0"
+    elif any(keyword in element_name for keyword in ['user', 'customer', 'client']):
+        return "John Doe"
+    
+    # Типы данных XML Schema
+    if element_type in ['xs:string', 'xsd:string', 'string']:
+        return f"sample_{name}"
+    elif element_type in ['xs:int', 'xs:integer', 'xsd:int', 'xsd:integer', 'int', 'integer']:
+        return "123"
+    elif element_type in ['xs:long', 'xsd:long', 'long']:
+        return "1234567890"
+    elif element_type in ['xs:float', 'xs:double', 'xsd:float', 'xsd:double', 'float', 'double']:
+        return "123.45"
+    elif element_type in ['xs:decimal', 'xsd:decimal', 'decimal']:
+        return "99.99"
+    elif element_type in ['xs:boolean', 'xsd:boolean', 'boolean']:
+        return "true"
+    elif element_type in ['xs:date', 'xsd:date', 'date']:
+        return "2024-01-01"
+    elif element_type in ['xs:datetime', 'xsd:datetime', 'datetime']:
+        return "2024-01-01T10:30:00Z"
+    elif element_type in ['xs:time', 'xsd:time', 'time']:
+        return "10:30:00"
+    elif element_type in ['xs:base64binary', 'xsd:base64binary', 'base64binary']:
+        return "U2FtcGxlIGJhc2U2NCBkYXRh"
+    elif element_type in ['xs:hexbinary', 'xsd:hexbinary', 'hexbinary']:
+        return "48656C6C6F"
+    
+    # Общие типы на основе ключевых слов
+    if any(word in element_type for word in ['string', 'text']):
+        return f"sample_{name}"
+    elif any(word in element_type for word in ['int', 'number', 'numeric']):
+        return "123"
+    elif any(word in element_type for word in ['bool', 'boolean']):
+        return "true"
+    elif any(word in element_type for word in ['date', 'time']):
+        return "2024-01-01T10:30:00Z"
+    elif any(word in element_type for word in ['money', 'currency', 'price']):
+        return "99.99"
+    elif any(word in element_type for word in ['percent']):
+        return "85.5"
+    
+    # Fallback
+    return f"sample_{name}"
+
+
 class WSDLOperation:
     """Модель SOAP операции из WSDL"""
     def __init__(self, name: str, soap_action: str, input_message: str, output_message: str,
@@ -50,11 +134,48 @@ class WSDLParseResult:
             'warnings': self.warnings
         }
 
+class WSDLCache:
+    """
+    LRU кэш результатов парсинга WSDL по URL
+    
+    Пока запись моложе ttl, документ не загружается повторно (типичный
+    сценарий - /preview и сразу /import). Устаревшая запись с ETag или
+    Last-Modified проверяется условным GET и переиспользуется при 304.
+    """
+    
+    def __init__(self, maxsize: int = 128, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, str], WSDLParseResult]]" = OrderedDict()
+    
+    def get(self, url: str) -> Optional[Tuple[bool, Dict[str, str], WSDLParseResult]]:
+        """Запись кэша: (свежая ли, заголовки-валидаторы, результат)"""
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        self._entries.move_to_end(url)
+        stored_at, validators, result = entry
+        return time.monotonic() - stored_at < self.ttl, validators, result
+    
+    def put(self, url: str, validators: Dict[str, str], result: WSDLParseResult):
+        self._entries[url] = (time.monotonic(), validators, result)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# Глобальный кэш разобранных WSDL
+wsdl_cache = WSDLCache()
+
+
 class WSDLService:
     """Сервис для работы с WSDL документами"""
     
-    def __init__(self):
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        # Общий клиент переиспользует соединения между запросами; собственный
+        # клиент создается только если общий не передан
+        self._owns_client = http_client is None
+        self.http_client = http_client or httpx.AsyncClient(timeout=30.0)
         self.namespaces = {
             'wsdl': 'http://schemas.xmlsoap.org/wsdl/',
             'soap': 'http://schemas.xmlsoap.org/wsdl/soap/',
@@ -75,18 +196,47 @@ class WSDLService:
         """
         result = WSDLParseResult()
         
+        # Проверяем кэш: свежий результат возвращаем без загрузки,
+        # для устаревшего делаем условный запрос
+        cached = wsdl_cache.get(wsdl_url)
+        request_headers = {}
+        if cached:
+            fresh, validators, cached_result = cached
+            if fresh:
+                logger.info(f"WSDL взят из кэша: {wsdl_url}")
+                return self._use_cached(cached_result)
+            if 'etag' in validators:
+                request_headers['If-None-Match'] = validators['etag']
+            if 'last-modified' in validators:
+                request_headers['If-Modified-Since'] = validators['last-modified']
+        
         try:
             logger.info(f"Загружаем WSDL с URL: {wsdl_url}")
             
-            # Загружаем WSDL документ
-            response = await self.http_client.get(wsdl_url)
-            response.raise_for_status()
+            # Загружаем WSDL документ потоком и сразу передаем куски парсеру,
+            # не накапливая весь документ в памяти
+            parser = self._create_parser()
+            size = 0
+            async with self.http_client.stream("GET", wsdl_url, headers=request_headers) as response:
+                if response.status_code == 304 and cached:
+                    logger.info(f"WSDL не изменился, используется кэш: {wsdl_url}")
+                    wsdl_cache.put(wsdl_url, validators, cached_result)
+                    return self._use_cached(cached_result)
+                response.raise_for_status()
+                validators = {
+                    name: response.headers[name]
+                    for name in ('etag', 'last-modified')
+                    if name in response.headers
+                }
+                async for chunk in response.aiter_bytes(WSDL_CHUNK_SIZE):
+                    parser.feed(chunk)
+                    size += len(chunk)
             
-            wsdl_content = response.text
-            logger.info(f"WSDL загружен, размер: {len(wsdl_content)} символов")
+            logger.info(f"WSDL загружен, размер: {size} байт")
             
-            # Парсим XML
-            root = ET.fromstring(wsdl_content)
+            # Операции ссылаются на message, binding и schema из любых частей
+            # документа, поэтому дерево собирается целиком
+            root = parser.close()
             
             # Определяем target namespace
             result.target_namespace = root.get('targetNamespace', '')
@@ -103,6 +253,9 @@ class WSDLService:
             
             logger.info(f"Найдено операций: {len(result.operations)}")
             
+            if not result.errors:
+                wsdl_cache.put(wsdl_url, validators, result)
+            
         except Exception as e:
             error_msg = f"Ошибка парсинга WSDL: {str(e)}"
             logger.error(error_msg)
@@ -110,7 +263,18 @@ class WSDLService:
         
         return result
     
-    async def _extract_service_info(self, root: ET.Element, result: WSDLParseResult, wsdl_url: str):
+    def _use_cached(self, result: WSDLParseResult) -> WSDLParseResult:
+        """Вернуть результат из кэша, восстановив target namespace для генерации envelope"""
+        if result.target_namespace:
+            self.namespaces['tns'] = result.target_namespace
+        return result
+    
+    @staticmethod
+    def _create_parser() -> ET.XMLParser:
+        """Парсер libxml2 без подстановки сущностей и сетевых запросов"""
+        return ET.XMLParser(remove_blank_text=True, resolve_entities=False, no_network=True)
+    
+    async def _extract_service_info(self, root: ET._Element, result: WSDLParseResult, wsdl_url: str):
         """Извлекает информацию о сервисе из WSDL"""
         
         # Ищем элемент service
@@ -146,7 +310,7 @@ class WSDLService:
         else:
             result.errors.append("Элемент service не найден в WSDL")
     
-    async def _extract_operations(self, root: ET.Element, result: WSDLParseResult):
+    async def _extract_operations(self, root: ET._Element, result: WSDLParseResult):
         """
         Извлекает операции из WSDL с улучшенной обработкой ошибок и fallback логикой
         """
@@ -253,7 +417,7 @@ class WSDLService:
             logger.info(f"Всего обработано операций: {operations_found}")
             result.warnings.append(f"Успешно обработано операций: {operations_found}")
     
-    async def _find_soap_action(self, root: ET.Element, operation_name: str) -> str:
+    async def _find_soap_action(self, root: ET._Element, operation_name: str) -> str:
         """Находит SOAP action для операции"""
         
         # Ищем в binding
@@ -273,7 +437,7 @@ class WSDLService:
         
         return ''
     
-    async def _extract_message_elements(self, root: ET.Element, message_name: str) -> List[Dict]:
+    async def _extract_message_elements(self, root: ET._Element, message_name: str) -> List[Dict]:
         """
         Извлекает элементы сообщения с улучшенной обработкой случаев без XSD
         """
@@ -350,7 +514,7 @@ class WSDLService:
         
         return elements
     
-    async def _extract_schema_elements(self, root: ET.Element, element_name: str) -> List[Dict]:
+    async def _extract_schema_elements(self, root: ET._Element, element_name: str) -> List[Dict]:
         """
         Извлекает элементы из XSD схемы с fallback логикой
         """
@@ -444,7 +608,9 @@ class WSDLService:
         if operation.input_elements:
             for element in operation.input_elements:
                 element_name = element['name']
-                element_value = request_data.get(element_name, self._generate_sample_value(element))
+                element_value = request_data.get(element_name)
+                if element_value is None:
+                    element_value = self._generate_sample_value(element)
                 element_type = element.get('type', '')
                 
                 # Добавляем комментарий с типом если есть
@@ -494,7 +660,9 @@ class WSDLService:
         if operation.output_elements:
             for element in operation.output_elements:
                 element_name = element['name']
-                element_value = response_data.get(element_name, self._generate_sample_value(element))
+                element_value = response_data.get(element_name)
+                if element_value is None:
+                    element_value = self._generate_sample_value(element)
                 element_type = element.get('type', '')
                 
                 # Добавляем комментарий с типом если есть
@@ -521,79 +689,9 @@ class WSDLService:
     
     def _generate_sample_value(self, element: Dict) -> str:
         """Генерирует реалистичное примерное значение для элемента на основе типа и имени"""
-        
-        element_type = element.get('type', '').lower()
-        element_name = element.get('name', '').lower()
-        
-        # Специфичные имена полей
-        if any(name in element_name for name in ['id', 'identifier']):
-            return "12345"
-        elif any(name in element_name for name in ['name', 'title', 'label']):
-            return f"Example {element['name']}"
-        elif any(name in element_name for name in ['email', 'mail']):
-            return "example@domain.com"
-        elif any(name in element_name for name in ['phone', 'tel']):
-            return "+1234567890"
-        elif any(name in element_name for name in ['url', 'link']):
-            return "https://example.com"
-        elif any(name in element_name for name in ['address', 'location']):
-            return "123 Main Street, City, Country"
-        elif any(name in element_name for name in ['price', 'cost', 'amount']):
-            return "99.99"
-        elif any(name in element_name for name in ['count', 'quantity', 'number']):
-            return "10"
-        elif any(name in element_name for name in ['status', 'state']):
-            return "active"
-        elif any(name in element_name for name in ['description', 'comment', 'note']):
-            return f"Description for {element['name']}"
-        elif any(name in element_name for name in ['code', 'key']):
-            return f"CODE_{element['name'].upper()}"
-        elif any(name in element_name for name in ['version']):
-            return "1.0"
-        elif any(name in element_name for name in ['user', 'customer', 'client']):
-            return "John Doe"
-        
-        # Типы данных XML Schema
-        if element_type in ['xs:string', 'xsd:string', 'string']:
-            return f"sample_{element['name']}"
-        elif element_type in ['xs:int', 'xs:integer', 'xsd:int', 'xsd:integer', 'int', 'integer']:
-            return "123"
-        elif element_type in ['xs:long', 'xsd:long', 'long']:
-            return "1234567890"
-        elif element_type in ['xs:float', 'xs:double', 'xsd:float', 'xsd:double', 'float', 'double']:
-            return "123.45"
-        elif element_type in ['xs:decimal', 'xsd:decimal', 'decimal']:
-            return "99.99"
-        elif element_type in ['xs:boolean', 'xsd:boolean', 'boolean']:
-            return "true"
-        elif element_type in ['xs:date', 'xsd:date', 'date']:
-            return "2024-01-01"
-        elif element_type in ['xs:datetime', 'xsd:datetime', 'datetime']:
-            return "2024-01-01T10:30:00Z"
-        elif element_type in ['xs:time', 'xsd:time', 'time']:
-            return "10:30:00"
-        elif element_type in ['xs:base64binary', 'xsd:base64binary', 'base64binary']:
-            return "U2FtcGxlIGJhc2U2NCBkYXRh"
-        elif element_type in ['xs:hexbinary', 'xsd:hexbinary', 'hexbinary']:
-            return "48656C6C6F"
-        
-        # Общие типы на основе ключевых слов
-        if any(word in element_type for word in ['string', 'text']):
-            return f"sample_{element['name']}"
-        elif any(word in element_type for word in ['int', 'number', 'numeric']):
-            return "123"
-        elif any(word in element_type for word in ['bool', 'boolean']):
-            return "true"
-        elif any(word in element_type for word in ['date', 'time']):
-            return "2024-01-01T10:30:00Z"
-        elif any(word in element_type for word in ['money', 'currency', 'price']):
-            return "99.99"
-        elif any(word in element_type for word in ['percent']):
-            return "85.5"
-        
-        # Fallback
-        return f"sample_{element['name']}"
+        return _sample_value(element.get('name', ''), element.get('type', ''))
     
     async def close(self):
-        """Закрытие HTTP клиента"""
-        await self.http_client.aclose() 
\ No newline at end of file
+        """Закрытие HTTP клиента (только собственного)"""
+        if self._owns_client:
+            await self.http_client.aclose() 
\ No newline at end of file
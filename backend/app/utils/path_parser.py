@@ -39,6 +39,25 @@ class PathParser:
         
         return None
     
+    @staticmethod
+    def compile_pattern(path_pattern: str) -> Tuple["re.Pattern", bool]:
+        """
+        Компилирует шаблон пути для многократного сопоставления
+        
+        Args:
+            path_pattern: Шаблон пути, например "/api/users/{id}" или "/users{*}"
+        
+        Returns:
+            Tuple[re.Pattern, bool]: (скомпилированное выражение, является ли шаблон wildcard).
+            Для wildcard шаблона захваченная часть пути находится в группе 1,
+            для остальных параметры доступны через groupdict()
+        """
+        if path_pattern.endswith('{*}'):
+            base_path = path_pattern[:-3]
+            return re.compile(f"^{re.escape(base_path)}(.*)", re.DOTALL), True
+        
+        return re.compile(PathParser._pattern_to_regex(path_pattern)), False
+    
     @staticmethod
     def _pattern_to_regex(path_pattern: str) -> str:
         """
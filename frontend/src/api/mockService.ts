@@ -86,6 +86,8 @@ export class LogWebSocketClient {
 
     try {
       this.ws = new WebSocket(url)
+      // Сервер отправляет логи бинарными фреймами (UTF-8 JSON)
+      this.ws.binaryType = 'arraybuffer'
 
       this.ws.onopen = () => {
         console.log('WebSocket подключен')
@@ -95,8 +97,13 @@ export class LogWebSocketClient {
 
       this.ws.onmessage = (event) => {
         try {
-          const message = JSON.parse(event.data)
-          if (message.type === 'log') {
+          const raw = typeof event.data === 'string'
+            ? event.data
+            : new TextDecoder().decode(event.data)
+          const message = JSON.parse(raw)
+          if (message.type === 'log_batch') {
+            message.items.forEach((log: RequestLog) => this.onMessage(log))
+          } else if (message.type === 'log') {
             this.onMessage(message.data)
           }
         } catch (error) {
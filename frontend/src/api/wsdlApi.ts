@@ -117,7 +117,10 @@ export class WSDLApi {
   /**
    * Импорт WSDL как mock сервисы
    */
-  async importWSDL(request: WSDLImportRequest): Promise<WSDLImportResult[]> {
+  async importWSDL(
+    request: WSDLImportRequest,
+    onResult?: (result: WSDLImportResult) => void
+  ): Promise<WSDLImportResult[]> {
     const response = await fetch(`${this.getBaseUrl()}/import`, {
       method: 'POST',
       headers: {
@@ -131,7 +134,31 @@ export class WSDLApi {
       throw new Error(errorData.detail || `HTTP error! status: ${response.status}`)
     }
 
-    return response.json()
+    // Сервер отдает результаты построчно (NDJSON) по мере сохранения сервисов
+    const results: WSDLImportResult[] = []
+    const handleLine = (line: string) => {
+      if (!line.trim()) return
+      const result: WSDLImportResult = JSON.parse(line)
+      results.push(result)
+      onResult?.(result)
+    }
+
+    const reader = response.body!.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+
+      buffer += decoder.decode(value, { stream: true })
+      const lines = buffer.split('\n')
+      buffer = lines.pop() ?? ''
+      lines.forEach(handleLine)
+    }
+    handleLine(buffer + decoder.decode())
+
+    return results
   }
 
   /**
@@ -66,9 +66,11 @@ const MockServiceForm: React.FC = () => {
         static_status_code: 200,
         conditional_status_code: 200,
         is_active: true,
+        log_level: 'full',
         proxy_delay: 0,
         static_delay: 0,
-        conditional_delay: 0
+        conditional_delay: 0,
+        conditional_cache_ttl: 0
       })
       
       // Инициализируем JSON редакторы с примерами
@@ -343,6 +345,7 @@ const MockServiceForm: React.FC = () => {
         ...processedValues,
         path: fullPath,
         service_type: processedValues.service_type || 'rest',
+        log_level: processedValues.log_level || 'full',
         condition_code: conditionCode,
         conditional_responses: cleanedConditionalResponses
       }
@@ -937,7 +940,7 @@ limit = query.get('limit', 10)
                   <Input placeholder="Например: User API" />
                 </Form.Item>
               </Col>
-              <Col span={12}>
+              <Col span={6}>
                 <Form.Item
                   name="is_active"
                   label="Активен"
@@ -946,6 +949,26 @@ limit = query.get('limit', 10)
                   <Switch checkedChildren="Да" unCheckedChildren="Нет" />
                 </Form.Item>
               </Col>
+              <Col span={6}>
+                <Form.Item
+                  name="log_level"
+                  label={
+                    <Space>
+                      Логирование
+                      <Tooltip title="Краткий лог содержит только метод, путь, статус и время обработки">
+                        <InfoCircleOutlined />
+                      </Tooltip>
+                    </Space>
+                  }
+                  initialValue="full"
+                >
+                  <Select>
+                    <Option value="full">Полное</Option>
+                    <Option value="summary">Краткое</Option>
+                    <Option value="none">Отключено</Option>
+                  </Select>
+                </Form.Item>
+              </Col>
             </Row>
 
             <Form.Item
@@ -1552,6 +1575,15 @@ limit = query.get('limit', 10)
                     <InputNumber min={0} step={0.1} style={{ width: '100%' }} />
                   </Form.Item>
                 </Col>
+                <Col span={8}>
+                  <Form.Item 
+                    name="conditional_cache_ttl" 
+                    label="Кэш ответов (сек)"
+                    tooltip="Одинаковые запросы в течение этого времени получают сохраненный статический ответ без выполнения кода условий. 0 - без кэша"
+                  >
+                    <InputNumber min={0} step={1} style={{ width: '100%' }} />
+                  </Form.Item>
+                </Col>
               </Row>
 
               <Form.Item label="Код для подготовки переменных">
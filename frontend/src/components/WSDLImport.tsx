@@ -130,14 +130,16 @@ const WSDLImport: React.FC<WSDLImportProps> = ({ onImportComplete }) => {
     if (!parseResult) return
 
     setLoading(true)
+    setImportResults([])
     try {
-      const results = await WSDLApiInstance.importWSDL({
-        wsdl_url: wsdlUrl,
-        base_path: basePath,
-        service_prefix: servicePrefix
-      })
-
-      setImportResults(results)
+      const results = await WSDLApiInstance.importWSDL(
+        {
+          wsdl_url: wsdlUrl,
+          base_path: basePath,
+          service_prefix: servicePrefix
+        },
+        result => setImportResults(prev => [...prev, result])
+      )
 
       const successCount = results.filter(r => r.status === 'created').length
       const failedCount = results.filter(r => r.status === 'failed').length
@@ -6,6 +6,7 @@ export interface MockService {
   strategy: 'proxy' | 'static' | 'conditional'
   service_type: 'rest' | 'soap'
   is_active: boolean
+  log_level: 'none' | 'summary' | 'full'
   
   // Proxy настройки
   proxy_url?: string
@@ -23,6 +24,7 @@ export interface MockService {
   conditional_delay: number
   conditional_status_code: number
   conditional_headers?: Record<string, string>
+  conditional_cache_ttl: number
   
   created_at: string
   updated_at?: string
@@ -45,6 +47,7 @@ export interface MockServiceCreate {
   strategy: 'proxy' | 'static' | 'conditional'
   service_type?: 'rest' | 'soap'
   is_active: boolean
+  log_level?: 'none' | 'summary' | 'full'
   
   proxy_url?: string
   proxy_delay?: number
@@ -57,6 +60,7 @@ export interface MockServiceCreate {
   conditional_delay?: number
   conditional_status_code?: number
   conditional_headers?: Record<string, string>
+  conditional_cache_ttl?: number
 }
 
 export interface ProxyInfo {
@@ -78,6 +82,7 @@ export interface RequestLog {
   headers?: Record<string, any>
   query_params?: Record<string, any>
   body?: string
+  body_len?: number
   response_status?: number
   response_body?: string
   response_headers?: Record<string, string>
@@ -90,4 +95,10 @@ export interface LogMessage {
   type: 'log'
   data: RequestLog
   timestamp: string
+}
+
+export interface LogBatchMessage {
+  type: 'log_batch'
+  items: RequestLog[]
+  timestamp: string
 } 
\ No newline at end of file